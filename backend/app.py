@@ -1,6 +1,20 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, url_for
-import json
+from flask import Flask, Response, abort, request, render_template
+from flask.json.provider import DefaultJSONProvider
+from flask_compress import Compress
+from werkzeug.security import safe_join
+from werkzeug.wsgi import FileWrapper
+from functools import lru_cache
+import orjson # Much faster JSON parsing/serialization than the stdlib json module
+import fastjsonschema
+import mimetypes
 import os
+import re
+from urllib.parse import quote
+from uuid import uuid4
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import threading
 import time # For timestamped output files
 import logging # Using Python's logging module
 from pharma_automation import run_workflow_processing # Your existing Python logic
@@ -11,27 +25,287 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__) # Get a logger for this specific module
 
-app = Flask(__name__,
-            static_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), '../build/static'),
-            template_folder='templates')
 
 # --- Configuration & Setup ---
 APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 # This directory will be used as the base for resolving CSV filenames from Source nodes
 DATA_FILES_BASE_DIR = APP_ROOT # Assume CSVs like pill_data.csv are in the 'backend' folder
 PROCESSED_OUTPUT_DIR = os.path.join(APP_ROOT, "processed_output")
-REACT_BUILD_DIR = os.path.join(APP_ROOT, '../build')
+# Resolved once instead of re-joining '..' per request; REACT_BUILD_DIR in the environment points it elsewhere (e.g. in tests)
+REACT_BUILD_DIR = os.path.normpath(os.environ.get('REACT_BUILD_DIR') or os.path.join(APP_ROOT, '../build'))
+REACT_INDEX_PATH = os.path.join(REACT_BUILD_DIR, 'index.html')
+MAX_WORKFLOW_BYTES = 4 * 1024 * 1024 # Workflow graphs are a few KB; anything near this is not a real workflow
+DOWNLOAD_CHUNK_SIZE = 64 * 1024 # Processed CSVs can be many MB; stream them in 64 KiB reads
+
+# URL patterns of the download/results routes below, formatted directly instead of a url_for() lookup per call
+DOWNLOAD_URL_TEMPLATE = '/processed_files/{}'
+RESULTS_URL_TEMPLATE = '/results/{}'
+JOB_STATUS_URL_TEMPLATE = '/jobs/{}'
+
+# Workflow runs are CPU-bound, so they go to a process pool rather than blocking the request worker.
+# JOBS maps job id -> (expiry time, Future) and lives in this process, so run a single web worker process.
+# Finished jobs nobody polls for are dropped once they pass JOB_TTL_SECONDS.
+# run_workflow_processing starts its own pool of processes for large CSVs, so the CPUs are split between
+# concurrent jobs: WORKFLOW_JOB_SLOTS jobs at a time, each with WORKERS_PER_JOB row-processing workers.
+# That keeps the total near the CPU count instead of one full-size inner pool per job (cpu_count² processes).
+WORKFLOW_JOB_SLOTS = min(4, os.cpu_count() or 1)
+WORKERS_PER_JOB = max(1, (os.cpu_count() or 1) // WORKFLOW_JOB_SLOTS)
+# Workers start from a forkserver (spawn where that's unavailable) rather than fork(): the web server is
+# multithreaded, and forking while another thread holds a lock can deadlock the child.
+WORKFLOW_MP_CONTEXT = multiprocessing.get_context(
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+WORKFLOW_EXECUTOR = ProcessPoolExecutor(max_workers=WORKFLOW_JOB_SLOTS, mp_context=WORKFLOW_MP_CONTEXT)
+# A worker that dies (OOM kill, segfault) breaks the whole pool for good; submit_job swaps in a new one under this lock
+WORKFLOW_EXECUTOR_LOCK = threading.Lock()
+JOB_TTL_SECONDS = 3600
+JOBS = {}
+
+# Decision counts for the results page, keyed by output filename, so they don't travel through the URL
+STATS_TTL_SECONDS = 3600
+STATS_CACHE = {} # output filename -> (expiry time, decision counts)
+
+
+# --- JSON Provider ---
+class OrJSONProvider(DefaultJSONProvider):
+    """
+    Routes request.get_json() and jsonify() through orjson instead of the stdlib json module.
+    dumps() honours default, sort_keys (JSON_SORT_KEYS via the sort_keys attribute), and the compact and
+    indent=2 layouts jsonify() asks for; any other formatting request goes to the stdlib implementation.
+    """
+    ensure_ascii = False # orjson always writes UTF-8; an explicit ensure_ascii=True still falls back
+
+    # Layouts orjson reproduces exactly: (indent, separators) -> option
+    ORJSON_LAYOUTS = {(None, (",", ":")): 0, (2, None): orjson.OPT_INDENT_2}
+
+    def dumps(self, obj, **kwargs):
+        default = kwargs.pop("default", self.default)
+        sort_keys = kwargs.pop("sort_keys", self.sort_keys)
+        ensure_ascii = kwargs.pop("ensure_ascii", self.ensure_ascii)
+        layout = (kwargs.pop("indent", None), kwargs.pop("separators", None))
+        if kwargs or ensure_ascii or layout not in self.ORJSON_LAYOUTS:
+            return super().dumps(obj, default=default, sort_keys=sort_keys, ensure_ascii=ensure_ascii,
+                                 indent=layout[0], separators=layout[1], **kwargs)
+        # Dates and dataclasses go through `default` as they do with the stdlib, instead of orjson's own format
+        option = (self.ORJSON_LAYOUTS[layout] | orjson.OPT_NON_STR_KEYS
+                  | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+app = Flask(__name__,
+            static_folder=os.path.join(REACT_BUILD_DIR, 'static'),
+            template_folder='templates')
+app.json = OrJSONProvider(app)
+# Werkzeug rejects larger bodies with 413 while reading, before anything is buffered or parsed
+app.config['MAX_CONTENT_LENGTH'] = MAX_WORKFLOW_BYTES
+
+# Compress JSON/HTML responses on the fly. File responses are direct_passthrough, which
+# flask-compress leaves alone, so downloads keep going out via wsgi.file_wrapper/sendfile.
+app.config['COMPRESS_ALGORITHM'] = ['br', 'gzip']
+app.config['COMPRESS_MIN_SIZE'] = 1024
+app.config['COMPRESS_LEVEL'] = 4 # gzip
+app.config['COMPRESS_BR_LEVEL'] = 4
+Compress(app)
+
+def json_response(payload, status=200):
+    """Builds a JSON Response straight from orjson's bytes, skipping jsonify's str round-trip."""
+    return Response(orjson.dumps(payload), status=status, mimetype='application/json')
+
 
 # Ensure the output directory exists on startup
 os.makedirs(PROCESSED_OUTPUT_DIR, exist_ok=True)
 
+# Build assets with a content hash in their name (e.g. main.3f2a1b4c.js) never change, so browsers may cache them forever
+HASHED_ASSET_PATTERN = re.compile(r'\.[0-9a-f]{8,}\.')
+# Pre-compressed siblings checked in order of preference, as (Content-Encoding, file suffix).
+# Generate them after `npm run build`, e.g. `brotli -k build/*.js` and `gzip -k build/*.js`.
+PRECOMPRESSED_VARIANTS = (('br', '.br'), ('gzip', '.gz'))
+
+# index.html is small and requested on every page load, so keep it in memory instead of touching disk per hit
+REACT_INDEX_HTML = None
+if os.path.isfile(REACT_INDEX_PATH):
+    with open(REACT_INDEX_PATH, 'rb') as index_file:
+        REACT_INDEX_HTML = index_file.read()
+
+
+# --- Workflow Schema ---
+# Only the fields WorkflowEngine indexes directly are required; everything else is optional.
+WORKFLOW_SCHEMA = {
+    "type": "object",
+    "required": ["nodes"],
+    "properties": {
+        "nodes": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["id", "type"],
+                "properties": {
+                    "id": {"type": "string"},
+                    "type": {"type": "string"},
+                },
+            },
+        },
+        "connections": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "required": ["sourceNodeId", "sourceOutputKey", "targetNodeId", "targetInputKey"],
+            },
+        },
+        "defaultAction": {"type": "string"},
+    },
+}
+# Compiled once at import; fastjsonschema generates a plain Python validator function
+validate_workflow = fastjsonschema.compile(WORKFLOW_SCHEMA)
+
+
+# --- URL Helper ---
+def build_url(template, filename):
+    """Equivalent of url_for() for the fixed file routes, honouring the app's mount prefix."""
+    return request.script_root + template.format(quote(filename))
+
+
+# --- Job Registry ---
+def replace_broken_executor(broken_executor):
+    """Replaces WORKFLOW_EXECUTOR with a fresh pool, unless another thread already replaced broken_executor."""
+    global WORKFLOW_EXECUTOR
+    with WORKFLOW_EXECUTOR_LOCK:
+        if WORKFLOW_EXECUTOR is broken_executor:
+            logger.warning("Workflow process pool is broken (a worker died); starting a new one.")
+            broken_executor.shutdown(wait=False)
+            WORKFLOW_EXECUTOR = ProcessPoolExecutor(max_workers=WORKFLOW_JOB_SLOTS, mp_context=WORKFLOW_MP_CONTEXT)
+
+def submit_job(fn, *args):
+    """
+    Queues fn(*args) on WORKFLOW_EXECUTOR and returns its job id, pruning abandoned finished jobs first.
+    A broken pool is replaced and the submit retried once; BrokenProcessPool propagates if that fails too.
+    """
+    now = time.monotonic()
+    for expired_id, (expires_at, future) in list(JOBS.items()): # list(): other request threads may add jobs meanwhile
+        if expires_at <= now and future.done():
+            JOBS.pop(expired_id, None)
+    executor = WORKFLOW_EXECUTOR
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        replace_broken_executor(executor)
+        future = WORKFLOW_EXECUTOR.submit(fn, *args)
+    job_id = uuid4().hex
+    JOBS[job_id] = (now + JOB_TTL_SECONDS, future)
+    return job_id
+
+
+# --- Results Stats Cache ---
+def remember_stats(filename, decisions):
+    """Stores a run's decision counts for its results page, dropping entries older than STATS_TTL_SECONDS."""
+    now = time.monotonic()
+    for key, (expires_at, _) in list(STATS_CACHE.items()): # list(): other request threads may add entries meanwhile
+        if expires_at <= now:
+            STATS_CACHE.pop(key, None) # Another thread may have dropped it already
+    STATS_CACHE[filename] = (now + STATS_TTL_SECONDS, decisions)
+
+def recall_stats(filename):
+    """Returns the cached decision counts for an output file, or {} if unknown or expired."""
+    entry = STATS_CACHE.get(filename)
+    if entry is None or entry[0] <= time.monotonic():
+        return {}
+    return entry[1]
+
+
+# --- File Sending Helper ---
+def send_file_wrapped(directory, filename, as_attachment=False, mimetype=None, block_size=8192):
+    """
+    Sends a file through the server's `wsgi.file_wrapper` when it provides one
+    (gunicorn/uWSGI map it to sendfile(2)), so the bytes never pass through Python.
+    Falls back to Werkzeug's FileWrapper otherwise, which streams `block_size`
+    chunks so memory stays flat regardless of file size. Range, If-Range and If-Modified-Since
+    are honoured like send_file(conditional=True) does.
+    """
+    filepath = safe_join(directory, filename) # Rejects '..' and absolute paths like send_from_directory does
+    if filepath is None or not os.path.isfile(filepath):
+        abort(404)
+
+    file_wrapper = request.environ.get('wsgi.file_wrapper', FileWrapper)
+    f = open(filepath, 'rb')
+    file_stat = os.fstat(f.fileno())
+    mimetype = mimetype or mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+    response = app.response_class(file_wrapper(f, block_size), mimetype=mimetype, direct_passthrough=True)
+    response.content_length = file_stat.st_size
+    response.last_modified = int(file_stat.st_mtime)
+    if as_attachment:
+        response.headers.set('Content-Disposition', 'attachment', filename=os.path.basename(filepath))
+    # Answers If-Modified-Since with 304 and Range/If-Range with 206, so interrupted downloads can resume
+    return response.make_conditional(request, accept_ranges=True, complete_length=file_stat.st_size)
+
 
 # --- Static File Serving for React App ---
+@lru_cache(maxsize=1024)
+def stat_build_file(path):
+    """
+    Returns (absolute path, mtime, size) for a regular file in the React build, or None.
+    The build is immutable between deploys, so results are cached for the life of the process.
+    """
+    filepath = safe_join(REACT_BUILD_DIR, path)
+    if filepath is None or not os.path.isfile(filepath):
+        return None
+    file_stat = os.stat(filepath)
+    return filepath, int(file_stat.st_mtime), file_stat.st_size
+
+def serve_build_file(path):
+    """
+    Serves a file from the React build directory with an mtime/size ETag,
+    answering 304 Not Modified when the browser already holds the current copy.
+    A pre-compressed .br/.gz sibling is sent instead when the client accepts it.
+    """
+    file_info = stat_build_file(path)
+    if file_info is None:
+        abort(404)
+
+    served_path, content_encoding = path, None
+    for encoding, suffix in PRECOMPRESSED_VARIANTS:
+        if encoding in request.accept_encodings:
+            variant_info = stat_build_file(path + suffix)
+            if variant_info:
+                served_path, content_encoding, file_info = path + suffix, encoding, variant_info
+                break
+
+    _, mtime, size = file_info
+    etag = f"{mtime}-{size}" # Inode-free so it is stable across servers
+    if content_encoding:
+        etag += f"-{content_encoding}"
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        # Content-Type comes from the uncompressed name so `app.js.br` is still served as JavaScript
+        response = send_file_wrapped(REACT_BUILD_DIR, served_path, mimetype=mimetypes.guess_type(path)[0])
+        if content_encoding:
+            response.headers['Content-Encoding'] = content_encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+
+    if HASHED_ASSET_PATTERN.search(os.path.basename(path)):
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else: # index.html, manifest.json, etc. must be revalidated so new deploys are picked up
+        response.cache_control.max_age = 0
+        response.cache_control.must_revalidate = True
+    return response
+
 @app.route('/')
 def index():
     """Serves the main index.html file of the React application."""
-    logger.info(f"Serving index.html from: {REACT_BUILD_DIR}")
-    return send_from_directory(REACT_BUILD_DIR, 'index.html')
+    logger.info("Serving index.html from: %s", REACT_BUILD_DIR)
+    if REACT_INDEX_HTML is None: # Build missing at startup; serve_build_file reports the 404
+        return serve_build_file('index.html')
+    response = Response(REACT_INDEX_HTML, mimetype='text/html')
+    response.cache_control.no_cache = True # Always revalidate so a new deploy's bundle names are picked up
+    response.add_etag()
+    return response.make_conditional(request)
 
 # This route should handle files like manifest.json, favicon.ico, etc., from the build root
 # and also be a fallback for other static assets if Flask's static_folder doesn't catch them.
@@ -40,65 +314,110 @@ def index():
 def serve_react_static_files(path):
     """Serves other static files from the React build directory."""
     # Check if the path exists directly in the build root
-    potential_path = os.path.join(REACT_BUILD_DIR, path)
-    if os.path.exists(potential_path) and not os.path.isdir(potential_path):
-        logger.info(f"Serving static file from build root: {path}")
-        return send_from_directory(REACT_BUILD_DIR, path)
+    if stat_build_file(path):
+        logger.info("Serving static file from build root: %s", path)
+        return serve_build_file(path)
     
     # Fallback: if it's not in the root, Flask might try to serve it from `static_folder` if path starts with `static_url_path`
     # If it's neither (e.g. a non-existent file or a React Router path),
     # this will result in a 404, which is often desired to let React Router handle it on the client.
     # For unhandled paths that are not static assets, let it 404 or serve index.html for client-side routing.
     # Re-serving index.html for all unhandled paths is a common SPA strategy.
-    logger.warning(f"Static file '{path}' not found directly in build root. SPA fallback to index.html may occur if not a static asset path.")
-    return send_from_directory(REACT_BUILD_DIR, 'index.html') # Fallback for SPA routing
+    logger.warning("Static file '%s' not found directly in build root. SPA fallback to index.html may occur if not a static asset path.", path)
+    return index() # Fallback for SPA routing
 
 
 # --- API Endpoint for Workflow Processing ---
 @app.route('/process_workflow', methods=['POST'])
 def process_workflow_route():
     """
-    Receives a workflow JSON, processes it using the automation engine
-    with a CSV specified by a Source node in the workflow,
-    and returns the results.
+    Receives a workflow JSON and queues it for processing by the automation engine
+    with a CSV specified by a Source node in the workflow.
+    Returns 202 with a job id; results are fetched from /jobs/<job_id>.
     """
     logger.info("Received POST request at /process_workflow")
-    if not request.is_json:
+    if not request.is_json: # Checked from the header alone, before the body is read
         logger.error("Request failed: Content-Type is not application/json")
-        return jsonify({"error": "Request must be JSON"}), 400
+        return json_response({"error": "Request must be JSON"}, 400)
 
-    workflow_data = request.get_json()
-    if not workflow_data or "nodes" not in workflow_data:
+    # Hand the raw body bytes straight to orjson: no str decode, and no cached copy kept on the request
+    try:
+        workflow_data = orjson.loads(request.get_data(cache=False))
+    except orjson.JSONDecodeError:
+        logger.error("Request failed: Body is not valid JSON")
+        return json_response({"error": "Request body is not valid JSON"}, 400)
+    if not isinstance(workflow_data, dict) or "nodes" not in workflow_data:
         logger.error("Request failed: No valid workflow data in JSON body")
-        return jsonify({"error": "No valid workflow data provided"}), 400
+        return json_response({"error": "No valid workflow data provided"}, 400)
+
+    try:
+        validate_workflow(workflow_data)
+    except fastjsonschema.JsonSchemaException as e:
+        logger.error("Request failed: Workflow does not match schema: %s", e.message)
+        return json_response({"error": f"Invalid workflow: {e.message}"}, 400)
 
     logger.info("Received valid workflow data.")
     # `run_workflow_processing` will determine the specific CSV from the Source node
     # We pass DATA_FILES_BASE_DIR as the directory where those CSVs are located.
+    try:
+        job_id = submit_job(run_workflow_processing, workflow_data, DATA_FILES_BASE_DIR, PROCESSED_OUTPUT_DIR, WORKERS_PER_JOB)
+    except BrokenProcessPool as e:
+        logger.error("Could not start workflow processing job: %s", e)
+        return json_response({"error": "The workflow processing service is unavailable. Please try again."}, 503)
+    logger.info("Submitted workflow processing job %s", job_id)
+
+    return json_response({
+        "message": "Workflow accepted for processing.",
+        "job_id": job_id,
+        "status_url": build_url(JOB_STATUS_URL_TEMPLATE, job_id)
+    }, 202)
 
+
+@app.route('/jobs/<job_id>')
+def job_status_route(job_id):
+    """
+    Reports the state of a workflow processing job. Returns 202 while it is still
+    queued or running, and the workflow results (or error) once it has finished.
+    """
+    entry = JOBS.get(job_id)
+    if entry is None:
+        return json_response({"error": f"Unknown job '{job_id}'"}, 404)
+    future = entry[1]
+    if not future.done():
+        return json_response({"job_id": job_id, "state": "running" if future.running() else "pending"}, 202)
+
+    # The finished result is handed out exactly once: only the poll that actually removes the job gets it
+    if JOBS.pop(job_id, None) is None:
+        return json_response({"error": f"Unknown job '{job_id}'"}, 404)
     try:
-        results = run_workflow_processing(workflow_data, DATA_FILES_BASE_DIR, PROCESSED_OUTPUT_DIR)
+        results = future.result()
     except ValueError as e: # Catches cycle detection from WorkflowEngine constructor
-        logger.error(f"Workflow processing failed due to invalid graph (e.g., cycle): {e}")
-        return jsonify({"error": str(e)}), 400
+        logger.error("Workflow processing failed due to invalid graph (e.g., cycle): %s", e)
+        return json_response({"error": str(e)}, 400)
+    except BrokenProcessPool as e: # The worker process died mid-job, e.g. killed for running out of memory
+        logger.error("Workflow processing job %s lost its worker process: %s", job_id, e)
+        return json_response({"error": "The process running this workflow stopped unexpectedly (it may have run out of memory). Please try again."}, 500)
     except Exception as e:
-        logger.error(f"An unexpected error occurred during workflow processing: {e}", exc_info=True)
-        return jsonify({"error": "An internal server error occurred during processing."}), 500
+        logger.error("An unexpected error occurred during workflow processing: %s", e, exc_info=True)
+        return json_response({"error": "An internal server error occurred during processing."}, 500)
 
-    logger.info(f"Workflow processing complete. Results: {results}")
+    logger.info("Workflow processing complete. Results: %s", results)
 
     if results.get("error"): # Handles errors caught within run_workflow_processing
-        return jsonify(results), 500 # Could also be 400 if it's a data issue
+        return json_response(results, 500) # Could also be 400 if it's a data issue
     
     output_filename = results.get("output_file")
-    download_url = url_for('serve_processed_file', filename=output_filename) if output_filename else None
-    # Pass stats to the results page via query parameters
-    stats_query_params = results.get("stats", {}).get("decisions", {}) if results.get("stats") else {}
-
-    results_page_url = url_for('show_results_page', filename=output_filename, **stats_query_params) if output_filename else None
+    download_url = build_url(DOWNLOAD_URL_TEMPLATE, output_filename) if output_filename else None
+    results_page_url = None
+    if output_filename:
+        # Keep the stats server-side for the results page instead of encoding them into its URL
+        remember_stats(output_filename, results.get("stats", {}).get("decisions", {}) if results.get("stats") else {})
+        results_page_url = build_url(RESULTS_URL_TEMPLATE, output_filename)
 
-    return jsonify({
+    return json_response({
         "message": "Workflow processed successfully!",
+        "job_id": job_id,
+        "state": "done",
         "stats": results.get("stats"),
         "output_filename": output_filename,
         "download_url": download_url,
@@ -106,34 +425,97 @@ def process_workflow_route():
     })
 
 
+@app.errorhandler(413)
+def request_too_large(e):
+    """Reports oversized workflow uploads as JSON so the editor can show the message."""
+    logger.error("Request failed: Body exceeds %d bytes", MAX_WORKFLOW_BYTES)
+    return json_response({"error": f"Request body too large (limit is {MAX_WORKFLOW_BYTES} bytes)"}, 413)
+
+
 # --- File Download and Results Page Routes ---
 @app.route('/processed_files/<path:filename>')
 def serve_processed_file(filename):
     """Serves a processed file from the output directory for download."""
-    logger.info(f"Serving processed file for download: {filename} from {PROCESSED_OUTPUT_DIR}")
-    return send_from_directory(PROCESSED_OUTPUT_DIR, filename, as_attachment=True)
+    logger.info("Serving processed file for download: %s from %s", filename, PROCESSED_OUTPUT_DIR)
+    return send_file_wrapped(PROCESSED_OUTPUT_DIR, filename, as_attachment=True,
+                             mimetype='text/csv', block_size=DOWNLOAD_CHUNK_SIZE)
 
 @app.route('/results/<path:filename>')
 def show_results_page(filename):
     """Displays a page with a summary and a link to download the processed file."""
-    logger.info(f"Showing results page for file: {filename}")
-    download_url = url_for('serve_processed_file', filename=filename)
-    stats = request.args.to_dict() # Retrieve stats passed as query parameters
-    return render_template('results.html', filename=filename, download_url=download_url, stats=stats)
+    logger.info("Showing results page for file: %s", filename)
+    download_url = build_url(DOWNLOAD_URL_TEMPLATE, filename)
+    stats_items = tuple(recall_stats(filename).items()) # A tuple keeps the decision order and is hashable
+    response = Response(render_results_page(filename, download_url, stats_items), mimetype='text/html')
+    response.add_etag()
+    return response.make_conditional(request)
+
+@lru_cache(maxsize=512)
+def render_results_page(filename, download_url, stats_items):
+    """Renders results.html once per distinct (file, stats) combination; revisits reuse the HTML."""
+    return render_template('results.html', filename=filename, download_url=download_url, stats=dict(stats_items))
+
+
+# --- Production Server ---
+def run_production_server(host, port):
+    """
+    Runs the app under gunicorn instead of Werkzeug's development server.
+    Uses a single worker process with threads: JOBS lives in-process and the CPU-heavy
+    work already runs in WORKFLOW_EXECUTOR, so the web worker only has to multiplex IO.
+    (gevent's monkey-patching does not mix well with the ProcessPoolExecutor, hence gthread.)
+    Falls back to Werkzeug's threaded server, with a warning, when gunicorn isn't installed.
+    """
+    try:
+        from gunicorn.app.base import BaseApplication # Only needed when actually serving in production
+    except ImportError:
+        logger.warning("gunicorn is not installed (pip install -r requirements.txt); falling back to Werkzeug's server.")
+        app.run(host=host, port=port, threaded=True)
+        return
+
+    class StandaloneApplication(BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+    options = {
+        'bind': f"{host}:{port}",
+        'workers': 1,
+        'worker_class': 'gthread',
+        'threads': 2 * (os.cpu_count() or 1) + 1,
+        'keepalive': 5,
+        'sendfile': True, # Lets wsgi.file_wrapper responses go out via sendfile(2)
+    }
+    StandaloneApplication(app, options).run()
 
 
 # --- Main Execution Block ---
 if __name__ == '__main__':
-    if not os.path.exists(os.path.join(REACT_BUILD_DIR, 'index.html')):
-        logger.critical(f"FATAL ERROR: React frontend build not found in {REACT_BUILD_DIR}")
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve the workflow editor and processing API.")
+    parser.add_argument('--debug', action='store_true', help="Use Flask's auto-reloading development server instead of gunicorn.")
+    args = parser.parse_args()
+
+    if REACT_INDEX_HTML is None:
+        logger.critical("FATAL ERROR: React frontend build not found in %s", REACT_BUILD_DIR)
         logger.critical("1. Ensure this script ('app.py') is in the 'backend' directory.")
         logger.critical("2. Ensure the 'build' directory (from 'npm run build') is a sibling to 'backend'.")
         logger.critical("3. Run 'npm run build' in your frontend's root directory if it's missing.")
     else:
-        logger.info(f"Starting Flask server...")
-        logger.info(f"Serving React app (index.html) from: {REACT_BUILD_DIR}")
-        logger.info(f"Serving React static assets (JS, CSS) from: {app.static_folder}")
-        logger.info(f"API endpoint available at /process_workflow")
-        logger.info(f"Base directory for data CSVs (from Source nodes): {DATA_FILES_BASE_DIR}")
-        logger.info(f"Processed files will be saved to: {PROCESSED_OUTPUT_DIR}")
-        app.run(debug=True, host='0.0.0.0', port=5001)
\ No newline at end of file
+        logger.info("Starting %s server...", 'Flask development' if args.debug else 'gunicorn')
+        logger.info("Serving React app (index.html) from: %s", REACT_BUILD_DIR)
+        logger.info("Serving React static assets (JS, CSS) from: %s", app.static_folder)
+        logger.info("API endpoint available at /process_workflow (poll /jobs/<job_id> for results)")
+        logger.info("Base directory for data CSVs (from Source nodes): %s", DATA_FILES_BASE_DIR)
+        logger.info("Processed files will be saved to: %s", PROCESSED_OUTPUT_DIR)
+        if args.debug:
+            app.run(debug=True, host='0.0.0.0', port=5001)
+        else:
+            run_production_server('0.0.0.0', 5001)
\ No newline at end of file
@@ -1,14 +1,558 @@
 import json
 import time
-from collections import deque
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import reduce
+from itertools import chain, islice
+import ast
 import csv
+import hashlib
+import importlib.util
+import keyword
+import operator
+import glob
 import re
 import os
+import stat
+import sys
 import logging
+from uuid import uuid4
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional; without it process_batch falls back to row-at-a-time processing
+    np = None
+try:
+    import numba
+except ImportError: # Numba is optional; without it batches stay on the NumPy array path
+    numba = None
 
 # --- Configure logging ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Globals handed to eval() for Rule expressions; built once instead of per row
+RESTRICTED_GLOBALS = {"__builtins__": {"True": True, "False": False, "len": len}}
+
+# Identifier scan for Rule code lines, compiled once; Python keywords (and, or, not, True, ...) are never variables
+IDENTIFIER_PATTERN = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*')
+PYTHON_KEYWORDS = frozenset(keyword.kwlist)
+
+# --- Value casting ---
+# Strings a "bool" Rule variable treats as True (case-insensitive); anything else is False
+BOOL_TRUE_STRINGS = frozenset({'true', '1', 't', 'y', 'yes'})
+
+def _cast_bool(value):
+    if isinstance(value, str): return value in BOOL_TRUE_STRINGS or value.lower() in BOOL_TRUE_STRINGS
+    return bool(value)
+
+# Rule variableType (lowercased) -> cast function; unknown types pass values through unchanged
+CASTERS = {
+    "float": float,
+    "int": lambda value: int(float(value)),
+    "string": str, # Changed from "str"
+    "bool": _cast_bool,
+}
+
+def make_caster(var_type):
+    """
+    Returns cast(value) for a Rule variableType, giving the same results as WorkflowEngine._cast_value
+    with the caster resolved once instead of per value.
+    """
+    caster = CASTERS.get(var_type.lower())
+    if caster is None:
+        return lambda value: value
+    def cast(value):
+        if value is None: return None
+        try: return caster(value)
+        except (ValueError, TypeError, OverflowError): return None # OverflowError: int() of inf
+    return cast
+
+# --- Node kinds ---
+# Node types are resolved to small ints once when the execution plan is built
+SOURCE, RULE, AND, OR, ACTION = range(5)
+NODE_KINDS = {"Source": SOURCE, "Rule": RULE, "AND": AND, "OR": OR, "Action": ACTION}
+
+# --- Rule interpreter ---
+# Closure trees built from a Rule's AST run without the frame setup and name lookups eval() pays per call.
+# Every closure uses the same Python operators eval() would, so results and exception messages are identical.
+RULE_BUILTINS = RESTRICTED_GLOBALS["__builtins__"]
+INTERPRETED_BINARY_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+                          ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+                          ast.Mod: operator.mod, ast.Pow: operator.pow}
+INTERPRETED_UNARY_OPS = {ast.Not: operator.not_, ast.USub: operator.neg, ast.UAdd: operator.pos, ast.Invert: operator.invert}
+INTERPRETED_COMPARE_OPS = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le,
+                           ast.Gt: operator.gt, ast.GtE: operator.ge, ast.In: lambda a, b: a in b,
+                           ast.NotIn: lambda a, b: a not in b, ast.Is: operator.is_, ast.IsNot: operator.is_not}
+
+def _interpret_node(node):
+    """Builds a closure fn(scope) for one AST node, or returns None for shapes left to eval()."""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        return lambda scope: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        def lookup(scope):
+            # Same resolution order as eval(): locals, then the restricted builtins
+            if name in scope: return scope[name]
+            if name in RULE_BUILTINS: return RULE_BUILTINS[name]
+            raise NameError(f"name '{name}' is not defined")
+        return lookup
+
+    if isinstance(node, ast.UnaryOp):
+        op, operand = INTERPRETED_UNARY_OPS.get(type(node.op)), _interpret_node(node.operand)
+        if op is None or operand is None: return None
+        return lambda scope: op(operand(scope))
+
+    if isinstance(node, ast.BinOp):
+        op = INTERPRETED_BINARY_OPS.get(type(node.op))
+        left, right = _interpret_node(node.left), _interpret_node(node.right)
+        if op is None or left is None or right is None: return None
+        return lambda scope: op(left(scope), right(scope))
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_interpret_node(value) for value in node.values]
+        if None in operands: return None
+        if isinstance(node.op, ast.And):
+            def and_(scope):
+                for operand in operands: # Short-circuits and returns the deciding operand, like `and`
+                    value = operand(scope)
+                    if not value: return value
+                return value
+            return and_
+        def or_(scope):
+            for operand in operands:
+                value = operand(scope)
+                if value: return value
+            return value
+        return or_
+
+    if isinstance(node, ast.Compare):
+        left = _interpret_node(node.left)
+        comparisons = [(INTERPRETED_COMPARE_OPS.get(type(op)), _interpret_node(comparator))
+                       for op, comparator in zip(node.ops, node.comparators)]
+        if left is None or any(op is None or comparator is None for op, comparator in comparisons): return None
+        if len(comparisons) == 1:
+            (op, right), = comparisons
+            if isinstance(node.comparators[0], ast.Constant): # The common `column <op> literal` shape
+                value = node.comparators[0].value
+                if isinstance(node.left, ast.Name):
+                    name = node.left.id
+                    # Reads the scope directly, leaving builtins and NameError to the generic lookup
+                    return lambda scope: op(scope[name] if name in scope else left(scope), value)
+                return lambda scope: op(left(scope), value)
+            return lambda scope: op(left(scope), right(scope))
+        def chained_compare(scope):
+            left_value = left(scope)
+            for op, comparator in comparisons:
+                right_value = comparator(scope)
+                result = op(left_value, right_value)
+                if not result: return result
+                left_value = right_value
+            return result
+        return chained_compare
+
+    return None
+
+def compile_rule_function(tree, code_obj):
+    """Returns fn(scope) evaluating a parsed Rule: an interpreted closure tree when possible, else eval()."""
+    interpreted = _interpret_node(tree.body)
+    if interpreted is not None:
+        return interpreted
+    return lambda scope: eval(code_obj, RESTRICTED_GLOBALS, scope)
+
+# A Rule as prepared by WorkflowEngine._compile_rule. fn is None for an empty or uncompilable codeLine,
+# vectorized is compile_vectorized_rule's (fn, kind, names) or None, and eval_scope is refilled for every row.
+CompiledRule = namedtuple("CompiledRule", "fn variables var_type vectorized eval_scope result_cache cast")
+
+# --- Rule result caching ---
+# Rules over low-cardinality columns (colors, flags, binned weights) see the same casted values over and over,
+# so per-row evaluation remembers each Rule's result per tuple of values. A Rule stops caching once it holds
+# RULE_CACHE_MAX_ENTRIES results, or once most of its first RULE_CACHE_WARMUP lookups were misses.
+RULE_CACHE_MAX_ENTRIES = 65536
+RULE_CACHE_WARMUP = 4096
+
+class RuleResultCache:
+    """Results of one Rule keyed by its casted variable values, in rule_vars order."""
+    __slots__ = ("results", "lookups", "enabled")
+
+    def __init__(self):
+        self.results = {}
+        self.lookups = 0
+        self.enabled = True
+
+    def store(self, key, result):
+        results = self.results
+        # Every miss stores one entry, so len(results) is the miss count
+        if len(results) >= RULE_CACHE_MAX_ENTRIES or (self.lookups >= RULE_CACHE_WARMUP and 2 * len(results) > self.lookups):
+            self.results = {}
+            self.enabled = False
+        else:
+            results[key] = result
+
+def rule_result_cacheable(tree, var_type):
+    """
+    Whether a Rule's result is fully determined by the values of its variables. That needs a known variableType
+    (so all values have one type and 1, 1.0 and True never share a key), an expression the closure interpreter
+    handles and no `is` comparisons (object identity isn't a value). Values that compare equal but differ, like
+    0.0 and -0.0, then give the same result, since division by zero raises rather than returning a signed infinity.
+    """
+    if var_type.lower() not in CASTERS or _interpret_node(tree.body) is None: return False
+    return not any(isinstance(n, (ast.Is, ast.IsNot)) for n in ast.walk(tree))
+
+# --- Vectorized Rule evaluation ---
+# How each Rule variableType is represented as a NumPy column: (expression kind, dtype, placeholder for unusable cells).
+# ints stay Python objects so arithmetic can't overflow the way int64 would.
+VECTOR_COLUMN_TYPES = {
+    "float": ("num", "float64", 0.0),
+    "int": ("num", object, 0),
+    "string": ("str", object, ""),
+    "bool": ("bool", bool, False),
+}
+VECTOR_MAX_EXACT_INT = 2 ** 53 # Largest int literal every float64 comparison still treats exactly
+VECTOR_COMPARE_OPS = {ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+                      ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge}
+# No division: Python raises ZeroDivisionError (rule -> False) where NumPy would quietly return inf/nan
+VECTOR_ARITH_OPS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul}
+
+def _vector_truth(value, kind):
+    """Elementwise equivalent of bool() for a translated sub-expression of the given kind."""
+    if kind == "num": return value != 0
+    if kind == "str": return value != ""
+    return value
+
+def _translate_vector_node(node, column_kind, names):
+    """
+    Translates one AST node into (fn(columns) -> array or scalar, kind), or None if it is outside
+    the supported subset. Kinds are "num", "str" and "bool"; only operations whose NumPy result
+    matches what eval() would produce for every value of those kinds are accepted.
+    """
+    if isinstance(node, ast.Name):
+        names.add(node.id)
+        return (lambda columns, name=node.id: columns[name]), column_kind
+
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool): kind = "bool"
+        elif isinstance(value, float): kind = "num"
+        # Larger ints would be rounded to float64 against float columns, where eval() compares them exactly
+        elif isinstance(value, int) and abs(value) <= VECTOR_MAX_EXACT_INT: kind = "num"
+        elif isinstance(value, str): kind = "str"
+        else: return None
+        return (lambda columns: value), kind
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _translate_vector_node(node.operand, column_kind, names)
+        if operand is None: return None
+        fn, kind = operand
+        if isinstance(node.op, ast.Not):
+            return (lambda columns: np.logical_not(_vector_truth(fn(columns), kind))), "bool"
+        if isinstance(node.op, (ast.USub, ast.UAdd)) and kind == "num":
+            op = operator.neg if isinstance(node.op, ast.USub) else operator.pos
+            return (lambda columns: op(fn(columns))), "num"
+        return None
+
+    if isinstance(node, ast.BinOp):
+        op = VECTOR_ARITH_OPS.get(type(node.op))
+        left = _translate_vector_node(node.left, column_kind, names)
+        right = _translate_vector_node(node.right, column_kind, names)
+        if op is None or left is None or right is None or left[1] != "num" or right[1] != "num": return None
+        left_fn, right_fn = left[0], right[0]
+        return (lambda columns: op(left_fn(columns), right_fn(columns))), "num"
+
+    if isinstance(node, ast.BoolOp):
+        operands = [_translate_vector_node(value, column_kind, names) for value in node.values]
+        if any(operand is None for operand in operands): return None
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+        return (lambda columns: reduce(combine, [_vector_truth(fn(columns), kind) for fn, kind in operands])), "bool"
+
+    if isinstance(node, ast.Compare):
+        operands = [_translate_vector_node(value, column_kind, names) for value in [node.left] + node.comparators]
+        ops = [VECTOR_COMPARE_OPS.get(type(op)) for op in node.ops]
+        if any(operand is None for operand in operands) or None in ops: return None
+        for (_, left_kind), (_, right_kind) in zip(operands, operands[1:]):
+            if (left_kind == "str") != (right_kind == "str"): return None # str vs number: TypeError or constant result in eval()
+        def compare(columns):
+            values = [fn(columns) for fn, _ in operands] # Each operand evaluated once, as in a Python chained comparison
+            return reduce(np.logical_and, [op(values[i], values[i + 1]) for i, op in enumerate(ops)])
+        return compare, "bool"
+
+    return None
+
+def compile_vectorized_rule(tree, var_type):
+    """
+    Translates a parsed Rule expression into (fn, kind, names) operating on NumPy column arrays,
+    or returns None when the expression or variable type isn't supported by the vectorized path.
+    """
+    column_type = VECTOR_COLUMN_TYPES.get(var_type.lower())
+    if np is None or column_type is None:
+        return None
+    names = set()
+    translated = _translate_vector_node(tree.body, column_type[0], names)
+    if translated is None:
+        return None
+    return translated[0], translated[1], frozenset(names)
+
+# --- Fused per-row functions ---
+# Inlined expressions deeper than this are assigned to a local first, keeping the generated source
+# well inside the parser's nesting limit for long gate chains
+ROW_FUNCTION_MAX_NESTING = 50
+# Shared nodes whose expression is longer than this are computed by a nested helper function, so
+# their expression is written once instead of at every use (which doubles per level of sharing)
+ROW_FUNCTION_MAX_INLINE = 400
+WALRUS_TARGET_PATTERN = re.compile(r"\((\w+) := ")
+
+def build_row_function(plan: list, evaluate_rule, default_action):
+    """
+    Generates and compiles one Python function deciding a single row for an execution plan:
+    straight-line code over local variables and inlined expressions, instead of a loop that
+    dispatches on node kind and stores output dicts. Rules are still evaluated by evaluate_rule
+    (WorkflowEngine._evaluate_rule), and Actions behave as in WorkflowEngine.process_event.
+
+    Rules and gates are evaluated lazily, inside the expression of the gate or Action that uses them,
+    so and/or short-circuiting skips Rules that can no longer change the result (a Rule feeding an AND
+    whose other input is already False is never run). A node used in more than one place is computed
+    at its first use and remembered in a local for the others; if its expression is long, it is
+    written once in a nested function that the uses call, keeping the source linear in the graph size.
+    """
+    namespace = {"evaluate_rule": evaluate_rule, "warning": logging.warning, "default_action": default_action}
+    uses = [0] * len(plan) # How many input expressions each node's outputs are inlined into
+    for _, _, inputs, _ in plan:
+        for source_idx, _ in inputs:
+            uses[source_idx] += 1
+
+    memo_locals = []
+    body = []
+    def lazy(name, expression, depth, idx):
+        """Returns (expression, depth) for a node's value, memoized in `name` if several inputs use it."""
+        if depth > ROW_FUNCTION_MAX_NESTING:
+            body.append(f"{name} = {expression}")
+            return name, 0
+        if uses[idx] < 2:
+            return expression, depth
+        memo_locals.append(name)
+        if len(expression) > ROW_FUNCTION_MAX_INLINE:
+            # Memo locals the expression assigns through := belong to decide_row, not the helper
+            assigned = dict.fromkeys([name] + WALRUS_TARGET_PATTERN.findall(expression))
+            body.append(f"def {name}_value():")
+            body.append(f"    nonlocal {', '.join(assigned)}")
+            body.append(f"    {name} = {expression}")
+            body.append(f"    return {name}")
+            return f"({name} if {name} is not None else {name}_value())", 1
+        return f"({name} if {name} is not None else ({name} := {expression}))", depth + 2
+
+    outputs = [None] * len(plan) # Output key -> (expression, nesting depth), per plan index
+    for idx, (kind, node, inputs, rule) in enumerate(plan):
+        inputs = [outputs[source_idx].get(source_key, ("False", 0)) for source_idx, source_key in inputs]
+        if kind == SOURCE:
+            outputs[idx] = {'output0': ("True", 0)}
+        elif kind == RULE:
+            namespace[f"rule{idx}"], namespace[f"node{idx}"] = rule, node
+            value, depth = lazy(f"r{idx}", f"evaluate_rule(rule{idx}, node{idx}, row_data, row_num_for_log, None, cast_cache)", 0, idx)
+            outputs[idx] = {'outputTrue': (value, depth), 'outputFalse': (f"(not {value})", depth + 1)}
+        elif kind == AND or kind == OR:
+            joiner = " and " if kind == AND else " or "
+            depth = max((input_depth for _, input_depth in inputs), default=0) + 1
+            expression = f"({joiner.join(expression for expression, _ in inputs)})" if inputs else repr(kind == AND)
+            outputs[idx] = {'output': lazy(f"g{idx}", expression, depth, idx)}
+        elif kind == ACTION:
+            outputs[idx] = {}
+            if not inputs: continue
+            label = node.get("label", "UnknownAction") # Action is identified by its label
+            namespace[f"label{idx}"], namespace[f"action{idx}"] = label, ACTION_IMPLEMENTATIONS.get(label)
+            body.append(f"if {' or '.join(expression for expression, _ in inputs)}:")
+            if namespace[f"action{idx}"] is None: # Resolved here once, not looked up per row
+                body.append(f"    warning(\"Row %s: No implementation for action '%s'.\", row_num_for_log, label{idx})")
+            else:
+                body.append(f"    action{idx}(row_data, True)")
+                if label == "DISCARD": body.append(f"    return 'DISCARD'")
+        else:
+            outputs[idx] = {}
+
+    lines = ["def decide_row(row_data, row_num_for_log):", "    cast_cache = {}"]
+    if memo_locals:
+        lines.append(f"    {' = '.join(memo_locals)} = None")
+    lines += [f"    {line}" for line in body]
+    lines.append("    return default_action")
+    exec(compile("\n".join(lines) + "\n", "<workflow>", "exec"), namespace)
+    return namespace["decide_row"]
+
+# --- Numba decision kernels ---
+# For workflows whose Rules are all float comparisons/arithmetic and whose Actions are all DISCARD,
+# the whole graph is generated as one Python function over typed columns and compiled with numba.njit:
+# every row walks the gates in native code, with and/or short-circuiting per row instead of combining
+# whole arrays per gate. Compiling takes about a second the first time, so it only pays off for large batches.
+NUMBA_MIN_ROWS = 100_000
+NUMBA_MAX_EXACT_INT = VECTOR_MAX_EXACT_INT # Larger int constants don't compare exactly against float64
+NUMBA_COMPARE_OPS = {ast.Eq: "==", ast.NotEq: "!=", ast.Lt: "<", ast.LtE: "<=", ast.Gt: ">", ast.GtE: ">="}
+NUMBA_ARITH_OPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*"} # Same subset as VECTOR_ARITH_OPS
+_numba_kernels = {} # Generated source -> compiled kernel, so each workflow shape compiles once per process
+# Generated kernels are written here as modules so numba's on-disk cache (njit(cache=True)), which needs a
+# real source file, lets worker processes reuse machine code compiled by earlier runs of the same workflow.
+# The files are imported and numba unpickles its index from here, so the directory must be private to this
+# user: it lives next to this module (or in NUMBA_CACHE_DIR when set), never in the shared temp dir.
+NUMBA_KERNEL_DIR = (os.path.join(os.environ["NUMBA_CACHE_DIR"], "workflow_kernels") if os.environ.get("NUMBA_CACHE_DIR")
+                    else os.path.join(os.path.dirname(os.path.abspath(__file__)), "numba_kernels"))
+NUMBA_KERNEL_CACHE_LIMIT = 64 # Kernel modules kept on disk; the oldest are removed when a new one is written
+
+def _numba_truth(source, kind):
+    return f"({source} != 0)" if kind == "num" else source
+
+def _numba_rule_source(node, local_names):
+    """
+    Translates a Rule AST node into (scalar Python source, kind) over the per-row float locals in
+    local_names (column -> local, extended as new columns appear), or returns None outside the
+    subset the vectorized path accepts.
+    """
+    if isinstance(node, ast.Name):
+        return local_names.setdefault(node.id, f"x{len(local_names)}"), "num"
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool): return repr(value), "bool"
+        if isinstance(value, float): return repr(value), "num"
+        if isinstance(value, int) and abs(value) <= NUMBA_MAX_EXACT_INT: return f"{value}.0", "num"
+        return None
+    if isinstance(node, ast.UnaryOp):
+        operand = _numba_rule_source(node.operand, local_names)
+        if operand is None: return None
+        if isinstance(node.op, ast.Not): return f"(not {_numba_truth(*operand)})", "bool"
+        if isinstance(node.op, (ast.USub, ast.UAdd)) and operand[1] == "num":
+            return f"({'-' if isinstance(node.op, ast.USub) else '+'}{operand[0]})", "num"
+        return None
+    if isinstance(node, ast.BinOp):
+        op = NUMBA_ARITH_OPS.get(type(node.op))
+        left = _numba_rule_source(node.left, local_names)
+        right = _numba_rule_source(node.right, local_names)
+        if op is None or left is None or right is None or left[1] != "num" or right[1] != "num": return None
+        return f"({left[0]} {op} {right[0]})", "num"
+    if isinstance(node, ast.BoolOp):
+        operands = [_numba_rule_source(value, local_names) for value in node.values]
+        if None in operands: return None
+        joiner = " and " if isinstance(node.op, ast.And) else " or "
+        return "(" + joiner.join(_numba_truth(*operand) for operand in operands) + ")", "bool"
+    if isinstance(node, ast.Compare):
+        operands = [_numba_rule_source(value, local_names) for value in [node.left] + node.comparators]
+        ops = [NUMBA_COMPARE_OPS.get(type(op)) for op in node.ops]
+        if None in operands or None in ops: return None
+        # Operands are side-effect free, so repeating the middle ones of a chain is safe
+        pairs = [f"({operands[i][0]} {op} {operands[i + 1][0]})" for i, op in enumerate(ops)]
+        return "(" + " and ".join(pairs) + ")", "bool"
+    return None
+
+def build_numba_plan(plan: list):
+    """
+    Generates the source of a numba kernel deciding every row for an execution plan.
+    Returns (source, column names in argument order, [(rule plan index, its column names)]) or None
+    when the plan has anything the kernel can't reproduce exactly.
+    """
+    if numba is None or np is None:
+        return None
+    column_locals = {} # Column name -> local variable holding the row's value
+    rule_columns = []
+    body = []
+    outputs = [None] * len(plan) # Output key -> scalar expression, per plan index
+    for idx, (kind, node, inputs, rule) in enumerate(plan):
+        inputs = [outputs[source_idx].get(source_key, "False") for source_idx, source_key in inputs]
+
+        if kind == SOURCE:
+            outputs[idx] = {'output0': "True"}
+        elif kind == RULE:
+            if rule.fn is None:
+                body.append(f"r{idx} = False")
+            else:
+                if rule.vectorized is None or rule.var_type.lower() != "float": return None
+                tree = ast.parse(node.get("codeLine", "False"), mode="eval")
+                translated = _numba_rule_source(tree.body, column_locals)
+                if translated is None: return None
+                names = tuple(sorted(rule.vectorized[2]))
+                if names != rule.variables: return None # Unscanned names raise NameError per row instead
+                if names: # ok{idx}[i] is False where one of the rule's columns failed to cast
+                    body.append(f"r{idx} = ok{idx}[i] and {_numba_truth(*translated)}")
+                    rule_columns.append((idx, names))
+                else:
+                    body.append(f"r{idx} = {_numba_truth(*translated)}")
+            outputs[idx] = {'outputTrue': f"r{idx}", 'outputFalse': f"(not r{idx})"}
+        elif kind == AND or kind == OR:
+            joiner = " and " if kind == AND else " or "
+            body.append(f"g{idx} = " + (joiner.join(inputs) if inputs else repr(kind == AND)))
+            outputs[idx] = {'output': f"g{idx}"}
+        elif kind == ACTION:
+            if node.get("label", "UnknownAction") != "DISCARD": return None
+            outputs[idx] = {}
+            if inputs:
+                body.append(f"if {' or '.join(inputs)}:")
+                body.append("    out[i] = 1")
+                body.append("    continue")
+        else:
+            outputs[idx] = {}
+
+    if not any(line.startswith("if ") for line in body): # No Action has an input, so nothing can ever fire
+        return None
+    column_names = list(column_locals)
+    args = [f"c{n}" for n in range(len(column_names))] + [f"ok{idx}" for idx, _ in rule_columns] + ["out"]
+    lines = [f"def decide({', '.join(args)}):", "    for i in prange(out.size):"]
+    lines += [f"        x{n} = c{n}[i]" for n in range(len(column_names))]
+    lines += [f"        {line}" for line in body]
+    return "\n".join(lines) + "\n", column_names, rule_columns
+
+def _ensure_private_kernel_dir():
+    """Creates NUMBA_KERNEL_DIR owner-only; raises PermissionError if it exists but another user could write to it."""
+    os.makedirs(NUMBA_KERNEL_DIR, mode=0o700, exist_ok=True)
+    dir_stat = os.lstat(NUMBA_KERNEL_DIR)
+    if (not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_mode & 0o022
+            or (hasattr(os, "getuid") and dir_stat.st_uid != os.getuid())):
+        raise PermissionError(f"'{NUMBA_KERNEL_DIR}' is not a directory private to this user")
+
+def _prune_numba_kernels(keep: str):
+    """Removes all but the newest NUMBA_KERNEL_CACHE_LIMIT kernel modules, with their bytecode and numba cache files."""
+    modules = []
+    for entry in os.scandir(NUMBA_KERNEL_DIR):
+        if entry.name.startswith("kernel_") and entry.name.endswith(".py"):
+            try:
+                modules.append((entry.stat().st_mtime, entry.name[:-3]))
+            except FileNotFoundError: # Removed by a concurrent worker
+                pass
+    modules.sort()
+    for _, module_name in modules[:-NUMBA_KERNEL_CACHE_LIMIT]:
+        if module_name == keep: continue
+        cache_files = glob.glob(os.path.join(NUMBA_KERNEL_DIR, "__pycache__", glob.escape(module_name) + ".*"))
+        for path in [os.path.join(NUMBA_KERNEL_DIR, module_name + ".py")] + cache_files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+def _load_numba_kernel_module(source: str):
+    """Writes the generated kernel to NUMBA_KERNEL_DIR and imports it, so numba can cache its machine code."""
+    module_source = "from numba import prange\n\n" + source
+    module_name = "kernel_" + hashlib.sha1(module_source.encode()).hexdigest()
+    module_path = os.path.join(NUMBA_KERNEL_DIR, module_name + ".py")
+    _ensure_private_kernel_dir() # Checked before importing anything that is already there
+    if not os.path.exists(module_path): # Same source, same file: its mtime stays valid for the cache
+        temp_path = f"{module_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(module_source)
+        os.replace(temp_path, module_path) # Atomic, so concurrent workers never import a partial file
+        _prune_numba_kernels(keep=module_name)
+    spec = importlib.util.spec_from_file_location(module_name, module_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module # numba re-imports the kernel's module by name when loading cached code
+    spec.loader.exec_module(module)
+    return module.decide
+
+def _compile_numba_kernel(source: str):
+    if source not in _numba_kernels:
+        try:
+            kernel = numba.njit(parallel=True, cache=True)(_load_numba_kernel_module(source))
+        except OSError as e:
+            logging.warning("Numba kernel cache unavailable (%s); compiling in memory.", e)
+            namespace = {"prange": numba.prange}
+            exec(source, namespace)
+            kernel = numba.njit(parallel=True)(namespace["decide"])
+        _numba_kernels[source] = kernel
+    return _numba_kernels[source]
+
 # --- Action Implementations ---
 ACTION_IMPLEMENTATIONS = {
     "DISCARD": lambda data_row, val: None,
@@ -19,6 +563,7 @@ class WorkflowEngine:
         self.nodes = {}
         self.connections_from_source = {}
         self.connections_to_target = {}
+        self.compiled_rules = {} # Rule node_id -> CompiledRule
         self.default_action = workflow_data.get('defaultAction', 'ACCEPT')
         self._load_workflow_from_data(workflow_data)
         try:
@@ -26,6 +571,52 @@ class WorkflowEngine:
         except ValueError as e: # Catch cycle error from topological sort
             logging.error(f"Error initializing WorkflowEngine: {e}")
             raise # Re-raise the error to be handled by the caller
+        self.plan = self._build_execution_plan()
+        self.numba_plan = build_numba_plan(self.plan)
+        self.decide_row = build_row_function(self.plan, self._evaluate_rule, self.default_action)
+
+    def _build_execution_plan(self):
+        """
+        Flattens the graph into a list of (kind, node, inputs, rule) entries in topological order.
+        Nodes are referred to by their position in the list, so the row function and batch path work on plain
+        list indexing instead of id-keyed dict lookups. `inputs` holds one (source index, source output key)
+        per input key and `rule` is the compiled Rule or None.
+
+        The list is laid out Action by Action: each Action comes right after the nodes it depends on
+        that aren't placed yet, with Actions kept in topological order. A row that hits DISCARD therefore
+        stops before evaluating Rules that only later Actions need, and nodes no Action depends on
+        (whose results could never change a decision) are left out.
+        """
+        connections_in = {} # node_id -> connections feeding it, one per input key
+        for node_id in self.node_order:
+            by_input_key = {} # A later connection to the same input key replaces the earlier one
+            for conn in self.connections_to_target.get(node_id, []):
+                by_input_key[conn["targetInputKey"]] = conn
+            connections_in[node_id] = list(by_input_key.values())
+
+        position = {node_id: i for i, node_id in enumerate(self.node_order)}
+        order = []
+        placed = set()
+        for action_id in self.node_order:
+            if NODE_KINDS.get(self.nodes[action_id]["type"]) != ACTION: continue
+            cone = set()
+            pending = [action_id]
+            while pending: # Walk back from the Action to every unplaced node it depends on
+                node_id = pending.pop()
+                if node_id in cone or node_id in placed: continue
+                cone.add(node_id)
+                pending.extend(conn["sourceNodeId"] for conn in connections_in[node_id])
+            order.extend(sorted(cone, key=position.__getitem__))
+            placed |= cone
+
+        index_of = {node_id: idx for idx, node_id in enumerate(order)}
+        plan = []
+        for node_id in order:
+            node = self.nodes[node_id]
+            kind = NODE_KINDS.get(node["type"])
+            inputs = tuple((index_of[conn["sourceNodeId"]], conn["sourceOutputKey"]) for conn in connections_in[node_id])
+            plan.append((kind, node, inputs, self.compiled_rules.get(node_id)))
+        return plan
 
     def _load_workflow_from_data(self, workflow: dict): # (No change needed here from your version)
         if not workflow or "nodes" not in workflow:
@@ -47,18 +638,46 @@ class WorkflowEngine:
             self.connections_from_source[source_id].append(conn_data)
             self.connections_to_target[target_id].append(conn_data)
 
+        for node_id, node in self.nodes.items():
+            if node["type"] == "Rule":
+                self.compiled_rules[node_id] = self._compile_rule(node)
+            elif node["type"] == "Action" and node.get("label", "UnknownAction") not in ACTION_IMPLEMENTATIONS:
+                logging.warning("Action '%s' has no implementation; rows reaching it keep their decision.", node.get('label', 'UnknownAction'))
+
+    def _compile_rule(self, node: dict):
+        """Compiles a Rule's codeLine once so rows only pay for executing it, not re-parsing it."""
+        code_line = node.get("codeLine", "False")
+        var_type = node.get("variableType", "string")
+        rule_fn = vectorized = result_cache = None
+        rule_vars = ()
+        if code_line: # Empty code_line always evaluates to False
+            try:
+                tree = ast.parse(code_line, f"<rule {node['id']}>", "eval")
+                code_obj = compile(tree, f"<rule {node['id']}>", "eval")
+            except (SyntaxError, ValueError) as e:
+                logging.warning("Rule '%s' (Code: '%s') does not compile: %s. It will always be False.", node.get('label', node['type']), code_line, e)
+            else:
+                rule_fn = compile_rule_function(tree, code_obj)
+                vectorized = compile_vectorized_rule(tree, var_type)
+                # Only identifiers the expression actually reads can depend on the row; keywords and
+                # words inside string literals are dropped here so rows never look them up
+                referenced = {n.id for n in ast.walk(tree) if isinstance(n, ast.Name)}
+                rule_vars = tuple(sorted(sys.intern(v) for v in self._get_variables_from_code_line(code_line) if v in referenced))
+                if rule_result_cacheable(tree, var_type): result_cache = RuleResultCache()
+        # The scope dict is refilled for every row rather than allocated per row per Rule
+        return CompiledRule(rule_fn, rule_vars, var_type, vectorized, {}, result_cache, make_caster(var_type))
+
     def _get_topological_order(self): # (No change needed here from your version)
         if not self.nodes: return []
-        in_degree = {node_id: len(self.connections_to_target.get(node_id, [])) for node_id in self.nodes}
-        queue = deque([node_id for node_id, degree in in_degree.items() if degree == 0])
-        sorted_order = []
-        while queue:
-            u_id = queue.popleft()
-            sorted_order.append(u_id)
-            for conn_info in self.connections_from_source.get(u_id, []):
+        # Every node has entries in both connection maps (see _load_workflow_from_data), so they're indexed directly
+        in_degree = {node_id: len(self.connections_to_target[node_id]) for node_id in self.nodes}
+        # The order list doubles as Kahn's FIFO queue: nodes are appended once ready and visited in that order
+        sorted_order = [node_id for node_id, degree in in_degree.items() if degree == 0]
+        for u_id in sorted_order: # Grows while iterating, which list iteration handles
+            for conn_info in self.connections_from_source[u_id]:
                 v_id = conn_info["targetNodeId"]
                 in_degree[v_id] -= 1
-                if in_degree[v_id] == 0: queue.append(v_id)
+                if in_degree[v_id] == 0: sorted_order.append(v_id)
         if len(sorted_order) != len(self.nodes):
             cycle_nodes = set(self.nodes.keys()) - set(sorted_order)
             error_msg = f"Workflow has a cycle. Nodes involved/unreached: {cycle_nodes}"
@@ -69,134 +688,405 @@ class WorkflowEngine:
 
     def _cast_value(self, value, target_type_str, column_name_for_error="<unknown column>"): # (No change needed)
         if value is None: return None
-        target_type_str = target_type_str.lower()
-        try:
-            if target_type_str == "float": return float(value)
-            if target_type_str == "int": return int(float(value))
-            if target_type_str == "string": return str(value) # Changed from "str"
-            if target_type_str == "bool":
-                if isinstance(value, str): return value.lower() in ['true', '1', 't', 'y', 'yes']
-                return bool(value)
-            return value
-        except (ValueError, TypeError): return None
+        caster = CASTERS.get(target_type_str.lower())
+        if caster is None: return value
+        try: return caster(value)
+        except (ValueError, TypeError, OverflowError): return None # OverflowError: int() of inf
 
-    def _get_variables_from_code_line(self, code_line): # (No change needed)
-        return set(re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*', code_line))
+    def _get_variables_from_code_line(self, code_line):
+        return set(IDENTIFIER_PATTERN.findall(code_line)) - PYTHON_KEYWORDS
 
-    def process_event(self, row_data: dict, row_num_for_log="N/A"): # (No change needed in signature or core logic)
-        evaluated_outputs = {node_id: {} for node_id in self.nodes}
+    def _evaluate_rule(self, rule, node, row_data: dict, row_num_for_log="N/A", present_vars=None, cast_cache=None):
+        """
+        Evaluates one compiled Rule against a single row. Any cast failure or eval error yields False.
+        `present_vars` lists the rule variables that are columns of the row, when the caller already knows.
+        `cast_cache` memoizes casts per (column, type) for the row so Rules sharing a variable cast it once.
+        """
+        rule_fn, rule_vars, var_type, _, eval_scope, result_cache, cast = rule # Unpacked once: this runs per row per Rule
+        if present_vars is None:
+            present_vars = [var_name for var_name in rule_vars if var_name in row_data]
+        
+        eval_scope.clear()
+        for var_name in present_vars:
+            if cast_cache is None:
+                casted_val = cast(row_data[var_name])
+            else:
+                cast_key = (var_name, var_type)
+                if cast_key in cast_cache:
+                    casted_val = cast_cache[cast_key]
+                else:
+                    casted_val = cast_cache[cast_key] = cast(row_data[var_name])
+            if casted_val is None and row_data[var_name] is not None:
+                return False # Value can't be cast to the rule's type, so the rule can't be evaluated
+            eval_scope[var_name] = casted_val
+        
+        if rule_fn is None: # Empty or uncompilable code_line
+            return False
+        if result_cache is not None and result_cache.enabled and len(eval_scope) == len(rule_vars):
+            key = tuple(eval_scope.values())
+            result_cache.lookups += 1
+            result = result_cache.results.get(key)
+            if result is not None: return result
+        else:
+            key = None
+        try:
+            result = bool(rule_fn(eval_scope))
+        except Exception as e: # Not cached, so every failing row is still logged
+            # %-style arguments: the message (and the scope's repr) is only built if a handler will emit it
+            logging.warning("Row %s: Error in rule '%s' (Code: '%s'): %s. Scope: %s. Defaulting to False.",
+                            row_num_for_log, node.get('label', node['type']), node.get('codeLine'), e, eval_scope)
+            return False
+        if key is not None: result_cache.store(key, result)
+        return result
+
+    def process_event(self, row_data: dict, row_num_for_log="N/A"):
+        """Returns the decision for one row. row_data is only read, never modified."""
         if not self.node_order: return "ERROR_WORKFLOW_ORDER"
+        return self.decide_row(row_data, row_num_for_log)
 
-        for node_id in self.node_order:
-            node = self.nodes.get(node_id) # node here is the dictionary from self.nodes
-            if not node: continue
+    def _cast_column(self, raw_values: list, var_name, var_type, cast_cache: dict):
+        """
+        Casts one column of a batch to a Rule's variable type, once per (column, type) per batch.
+        Returns (values array, cast-failed mask, missing-value mask); unusable cells hold a placeholder.
+        """
+        key = (var_name, var_type)
+        if key not in cast_cache:
+            _, dtype, placeholder = VECTOR_COLUMN_TYPES[var_type.lower()]
+            cast = make_caster(var_type)
+            values = []
+            failed = np.zeros(len(raw_values), dtype=bool)
+            missing = np.zeros(len(raw_values), dtype=bool)
+            for i, raw_value in enumerate(raw_values):
+                casted_val = cast(raw_value)
+                if casted_val is None:
+                    if raw_value is None: missing[i] = True
+                    else: failed[i] = True
+                    casted_val = placeholder
+                values.append(casted_val)
+            cast_cache[key] = (np.array(values, dtype=dtype), failed, missing)
+        return cast_cache[key]
 
-            # node_specific_data is node itself in this structure
-            node_type = node["type"]
-            node_display_label = node.get("label", node_type)
-            current_node_inputs = {}
-            for conn in self.connections_to_target.get(node_id, []):
-                source_id, source_key = conn["sourceNodeId"], conn["sourceOutputKey"]
-                target_key = conn["targetInputKey"]
-                input_value = evaluated_outputs.get(source_id, {}).get(source_key, False)
-                current_node_inputs[target_key] = input_value
-
-            if node_type == "Source": # Source nodes simply propagate a 'True' signal for now
-                evaluated_outputs[node_id]['output0'] = True
-            
-            elif node_type == "Rule":
-                code_line = node.get("codeLine", "False")
-                var_type = node.get("variableType", "string") # Corrected: was "string"
-                
-                eval_scope = {}
-                possible_to_eval = True
-                for var_name in self._get_variables_from_code_line(code_line):
-                    if var_name in row_data:
-                        casted_val = self._cast_value(row_data[var_name], var_type)
-                        if casted_val is None and row_data[var_name] is not None:
-                            possible_to_eval = False; break
-                        eval_scope[var_name] = casted_val
-                
-                result = False
-                if possible_to_eval and code_line: # Check if code_line is not empty
-                    try:
-                        restricted_globals = {"__builtins__": {"True": True, "False": False, "len": len}}
-                        result = bool(eval(code_line, restricted_globals, eval_scope))
-                    except Exception as e:
-                        logging.warning(f"Row {row_num_for_log}: Error in rule '{node_display_label}' (Code: '{code_line}'): {e}. Scope: {eval_scope}. Defaulting to False.")
-                        result = False
-                else:
-                    result = False # If not possible to eval or empty code_line
-
-                evaluated_outputs[node_id]['outputTrue'] = result
-                evaluated_outputs[node_id]['outputFalse'] = not result
-
-            elif node_type in ["AND", "OR"]:
-                # Ensure current_node_inputs.values() are boolean
-                input_values = [bool(v) for v in current_node_inputs.values()]
-                if node_type == "AND":
-                    result = all(input_values) if input_values else True # Empty AND is true
-                else: # OR
-                    result = any(input_values) if input_values else False # Empty OR is false
-                evaluated_outputs[node_id]['output'] = result
-
-
-            elif node_type == "Action":
-                # An action is triggered if ANY of its inputs are true.
-                # For single input action node, this simplifies to checking that one input.
-                action_triggered = any(bool(v) for v in current_node_inputs.values())
-                if action_triggered:
-                    action_label = node.get("label", "UnknownAction") # Action is identified by its label
-                    action_func = ACTION_IMPLEMENTATIONS.get(action_label)
+    def _evaluate_rule_batch(self, rule, node, columns, num_rows, cast_cache: dict, undecided, first_row_num):
+        """
+        Evaluates a Rule for every row of a batch, returning a boolean array.
+        Rows with a missing value (None in eval scope) and rules outside the vectorized subset
+        go through _evaluate_rule one row at a time, so results match process_event exactly.
+        """
+        rule_fn, rule_vars, var_type, vectorized = rule.fn, rule.variables, rule.var_type, rule.vectorized
+        result = np.zeros(num_rows, dtype=bool)
+        if rule_fn is None: # Empty or uncompilable code_line
+            return result
+
+        # Every row of a batch has the same columns, so which variables are present is decided once
+        present_vars = [var_name for var_name in rule_vars if var_name in columns]
+        row_values = lambda i: {var_name: columns[var_name][i] for var_name in present_vars} # All _evaluate_rule reads
+        if vectorized is None or len(present_vars) != len(vectorized[2]):
+            for i in np.flatnonzero(undecided):
+                result[i] = self._evaluate_rule(rule, node, row_values(i), first_row_num + i, present_vars)
+            return result
+
+        vector_fn, vector_kind, _ = vectorized
+        casted_columns = {}
+        failed = np.zeros(num_rows, dtype=bool)
+        missing = np.zeros(num_rows, dtype=bool)
+        for var_name in present_vars:
+            values, var_failed, var_missing = self._cast_column(columns[var_name], var_name, var_type, cast_cache)
+            failed |= var_failed # Any uncastable variable makes the rule False, as in _evaluate_rule
+            missing |= var_missing
+            casted_columns[var_name] = values
+
+        with np.errstate(all="ignore"): # Float overflow gives inf silently in Python too
+            result[:] = _vector_truth(vector_fn(casted_columns), vector_kind)
+        result[failed] = False
+        for i in np.flatnonzero(missing & ~failed & undecided):
+            result[i] = self._evaluate_rule(rule, node, row_values(i), first_row_num + i, present_vars)
+        return result
+
+    def process_batch(self, rows: list, first_row_num=2):
+        """
+        Returns the decision for each row of a batch (rows must share the same columns; they are not modified).
+        Columns are gathered from the row dicts as Rules need them; see process_columns.
+        """
+        if not rows: return []
+        return self._process_columns(RowColumns(rows), len(rows), rows.__getitem__, first_row_num)
+
+    def process_columns(self, columns: dict, first_row_num=2):
+        """
+        Returns the decision for each row of a columnar batch ({column name: list of values}, all the same length).
+        With NumPy available, Rules are evaluated column-wise and gates/actions combine boolean
+        arrays, which avoids walking the graph once per row. Without NumPy this is just
+        process_event applied to each row.
+        """
+        num_rows = len(next(iter(columns.values()), ()))
+        row_at = lambda i: {name: values[i] for name, values in columns.items()}
+        return self._process_columns(columns, num_rows, row_at, first_row_num)
+
+    def _process_columns_numba(self, columns, num_rows, row_at, cast_cache):
+        """
+        Decides a batch with the workflow's numba kernel. Returns None (use the array path) when a column
+        the kernel reads is absent or has blank cells, since those rows need eval()'s None semantics.
+        """
+        source, column_names, rule_columns = self.numba_plan
+        if any(name not in columns for name in column_names): return None
+        casted = {}
+        for name in column_names:
+            values, failed, missing = self._cast_column(columns[name], name, "float", cast_cache)
+            if missing.any(): return None
+            casted[name] = (values, failed)
+        ok_masks = [~reduce(np.logical_or, [casted[name][1] for name in names]) for _, names in rule_columns]
+        out = np.zeros(num_rows, dtype=np.uint8)
+        _compile_numba_kernel(source)(*[casted[name][0] for name in column_names], *ok_masks, out)
+
+        decisions = [self.default_action] * num_rows
+        action_func = ACTION_IMPLEMENTATIONS["DISCARD"]
+        for i in np.flatnonzero(out):
+            action_func(row_at(i), True)
+            decisions[i] = "DISCARD"
+        return decisions
+
+    def _process_columns(self, columns, num_rows, row_at, first_row_num):
+        # row_at(i) rebuilds row i as a dict, for per-row processing and for action implementations
+        if np is None or not num_rows:
+            return [self.process_event(row_at(i), first_row_num + i) for i in range(num_rows)]
+        if not self.node_order: return ["ERROR_WORKFLOW_ORDER"] * num_rows
+
+        cast_cache = {}
+        if self.numba_plan is not None and num_rows >= NUMBA_MIN_ROWS:
+            decisions = self._process_columns_numba(columns, num_rows, row_at, cast_cache)
+            if decisions is not None: return decisions
+
+        decisions = [self.default_action] * num_rows
+        undecided = np.ones(num_rows, dtype=bool) # Rows no DISCARD has fired for yet
+        evaluated_outputs = [None] * len(self.plan)
+
+        for idx, (kind, node, inputs, rule) in enumerate(self.plan):
+            input_values = [evaluated_outputs[source_idx].get(source_key, False) for source_idx, source_key in inputs]
+
+            if kind == SOURCE:
+                evaluated_outputs[idx] = {'output0': np.ones(num_rows, dtype=bool)}
+
+            elif kind == RULE:
+                result = self._evaluate_rule_batch(rule, node, columns, num_rows, cast_cache, undecided, first_row_num)
+                evaluated_outputs[idx] = {'outputTrue': result, 'outputFalse': ~result}
+
+            elif kind == AND or kind == OR:
+                result = np.full(num_rows, kind == AND) # Empty AND is true, empty OR is false
+                for value in input_values:
+                    if kind == AND: result &= value
+                    else: result |= value
+                evaluated_outputs[idx] = {'output': result}
+
+            elif kind == ACTION:
+                evaluated_outputs[idx] = {}
+                triggered = np.zeros(num_rows, dtype=bool)
+                for value in input_values:
+                    triggered |= value
+                triggered &= undecided # Rows already discarded never reach later actions
+                if not triggered.any():
+                    continue
+                action_label = node.get("label", "UnknownAction") # Action is identified by its label
+                action_func = ACTION_IMPLEMENTATIONS.get(action_label)
+                for i in np.flatnonzero(triggered):
                     if action_func:
-                        action_func(row_data, True) # Pass True as val, can be ignored by lambda
+                        action_func(row_at(i), True)
                         if action_label == "DISCARD":
-                            return "DISCARD"
+                            decisions[i] = "DISCARD"
                     else:
-                        logging.warning(f"Row {row_num_for_log}: No implementation for action '{action_label}'.")
-        
-        return self.default_action
+                        logging.warning("Row %s: No implementation for action '%s'.", first_row_num + i, action_label)
+                if action_func and action_label == "DISCARD":
+                    undecided &= ~triggered
+                    if not undecided.any(): break
 
+            else: # Unknown node types produce no outputs
+                evaluated_outputs[idx] = {}
 
-def load_csv_data_from_file(filepath): # (No major change, ensure it handles various empty/whitespace cases)
-    data_list = []
-    if not os.path.exists(filepath): # Add check for file existence
-        logging.error(f"CSV data file '{filepath}' not found.")
-        return None
+        return decisions
+
+
+class RowColumns(dict):
+    """Read-only column view over a list of row dicts sharing the same keys; each column is gathered on first use."""
+    def __init__(self, rows: list):
+        super().__init__()
+        self.rows = rows
+
+    def __contains__(self, column_name):
+        return column_name in self.rows[0]
+
+    def __missing__(self, column_name):
+        values = self[column_name] = [row[column_name] for row in self.rows]
+        return values
+
+
+# Cells starting with a letter or underscore (after an optional sign) can't be numbers, except for
+# inf/infinity/nan, which float() accepts in any case. Matching this skips a raised-and-caught ValueError.
+CSV_NON_NUMERIC_PATTERN = re.compile(r'[+-]?[a-hj-mo-zA-HJ-MO-Z_]')
+
+# Usual spellings of CSV booleans, matched exactly before falling back to a case-insensitive check
+CSV_BOOL_SPELLINGS = {'true': True, 'True': True, 'TRUE': True, 'false': False, 'False': False, 'FALSE': False}
+
+def parse_csv_column(raw_values):
+    """
+    Parses a column of raw CSV cells into a list, with the same results as parse_csv_value per cell.
+    Numeric and boolean runs convert in one C-level pass, up to the first cell that needs parse_csv_value;
+    float() already ignores surrounding whitespace and rejects blanks and booleans, so it only succeeds
+    where parse_csv_value would give the same float.
+    """
+    values = []
+    try:
+        values.extend(map(float, raw_values)) # On failure, values keeps the cells converted before it
+        return values
+    except (ValueError, TypeError): pass # TypeError: None padding from a short row
+    if not values:
+        try:
+            values.extend(map(CSV_BOOL_SPELLINGS.__getitem__, raw_values))
+            return values
+        except (KeyError, TypeError): pass
+    remaining = raw_values[len(values):]
+    distinct = set(remaining)
+    if len(distinct) * 2 <= len(remaining): # Mostly repeated cells (categories, flags): parse each distinct cell once
+        parsed = {raw_value: parse_csv_value(raw_value) for raw_value in distinct}
+        values.extend(map(parsed.__getitem__, remaining))
+    else:
+        values += [parse_csv_value(raw_value) for raw_value in remaining]
+    return values
+
+def parse_csv_value(raw_value):
+    """Converts one CSV cell: blank -> None, 'true'/'false' -> bool, numeric -> float, anything else stays a stripped string."""
+    if raw_value is None: return None
+    value = raw_value.strip()
+    if value == "": return None
+    parsed_bool = CSV_BOOL_SPELLINGS.get(value)
+    if parsed_bool is None and len(value) in (4, 5) and value[0] in 'tTfF': # Only these can lower() to 'true'/'false'
+        parsed_bool = CSV_BOOL_SPELLINGS.get(value.lower())
+    if parsed_bool is not None: return parsed_bool
+    if CSV_NON_NUMERIC_PATTERN.match(value): return value
+    try: return float(value)
+    except ValueError: return value
+
+# Rows read, decided and written per batch when streaming a CSV; bounds memory to one batch
+STREAM_BATCH_ROWS = 200_000
+OUTPUT_BUFFER_BYTES = 1 << 20 # Output file buffer; the 8 KiB default means a write syscall every few dozen rows
+
+# Rows transposed into columns at a time while reading; keeps the short-lived row lists few enough
+# that they don't pile up into costly full garbage collections
+TRANSPOSE_CHUNK_ROWS = 4096
+
+def _iter_raw_columns(reader, num_columns: int, batch_rows):
+    # Yields lists of raw cell columns for up to batch_rows CSV lines each (all lines if None)
+    while True:
+        raw_columns = [[] for _ in range(num_columns)]
+        lines_read = 0
+        while batch_rows is None or lines_read < batch_rows:
+            chunk_size = TRANSPOSE_CHUNK_ROWS if batch_rows is None else min(TRANSPOSE_CHUNK_ROWS, batch_rows - lines_read)
+            rows = list(islice(reader, chunk_size))
+            if not rows: break
+            lines_read += len(rows)
+            rows = [row for row in rows if row] # Blank lines are skipped, like csv.DictReader does
+            if any(map(num_columns.__ne__, map(len, rows))):
+                # Short rows read as blanks; extra cells past the header are ignored
+                rows = [row[:num_columns] + [None] * (num_columns - len(row)) for row in rows]
+            for raw_column, cells in zip(raw_columns, zip(*rows)):
+                raw_column.extend(cells)
+        if raw_columns[0]:
+            yield raw_columns
+        if batch_rows is None or lines_read < batch_rows: # Reached the end of the file
+            return
+
+def iter_csv_columnar(filepath, batch_rows=STREAM_BATCH_ROWS):
+    """
+    Yields a CSV as {stripped header: list of parsed values} batches of up to batch_rows rows (all rows if None),
+    one list per column, instead of one dict per row. Cells are parsed with parse_csv_column.
+    Yields nothing when there is no header; read errors are logged and re-raised as ValueError.
+    """
     try:
         with open(filepath, mode='r', newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            if not reader.fieldnames:
+            reader = csv.reader(csvfile)
+            header = next(reader, None)
+            if not header:
                 logging.warning(f"CSV file '{filepath}' is empty or has no header row.")
-                return []
-            
-            stripped_fieldnames = [h.strip() for h in reader.fieldnames] # Store stripped fieldnames
-            
-            for row_dict_original_case in reader:
-                processed_row = {}
-                # Use original fieldnames for reading, then map to stripped fieldnames for consistency
-                for i, original_header in enumerate(reader.fieldnames): # reader.fieldnames has original case
-                    stripped_header = stripped_fieldnames[i]
-                    raw_value = row_dict_original_case.get(original_header) # Use original key to get value
-                    
-                    if raw_value is None or raw_value.strip() == "":
-                        processed_row[stripped_header] = None 
-                        continue
-                    
-                    value = raw_value.strip()
-                    if value.lower() == 'true': processed_row[stripped_header] = True
-                    elif value.lower() == 'false': processed_row[stripped_header] = False
-                    else:
-                        try: processed_row[stripped_header] = float(value)
-                        except ValueError: processed_row[stripped_header] = value 
-                data_list.append(processed_row)
-    except Exception as e:
+                return
+
+            header = [sys.intern(h.strip()) for h in header] # Same objects as Rule variable names, so key lookups hit the identity fast path
+            for raw_columns in _iter_raw_columns(reader, len(header), batch_rows):
+                # Duplicate header names keep the last column, as the row dicts did
+                yield dict(zip(header, map(parse_csv_column, raw_columns)))
+    except (OSError, csv.Error, ValueError) as e: # ValueError covers UnicodeDecodeError
         logging.error(f"Error reading CSV file '{filepath}': {e}")
-        return None # Return None on error
-    return data_list
+        raise ValueError(f"Failed to load data from '{filepath}'. Check logs.") from e
+
+def load_csv_columnar(filepath):
+    """
+    Loads a whole CSV as {stripped header: list of parsed values}; see iter_csv_columnar.
+    Returns None on read errors and {} when there is no header.
+    """
+    if not os.path.exists(filepath):
+        logging.error("CSV data file '%s' not found.", filepath)
+        return None
+    try:
+        return next(iter_csv_columnar(filepath, batch_rows=None), {})
+    except ValueError:
+        return None
+
+def load_csv_data_from_file(filepath): # (No major change, ensure it handles various empty/whitespace cases)
+    """
+    Loads a whole CSV as a list of row dicts keyed by the stripped headers. The file is read with csv.reader
+    into columns (see iter_csv_columnar), and row dicts are only built here, at the boundary, for callers
+    that want them. Returns None on read errors and [] when there is no header.
+    """
+    columns = load_csv_columnar(filepath)
+    if columns is None: return None
+    header = list(columns)
+    return [dict(zip(header, values)) for values in zip(*columns.values())]
+
+# --- Parallel row processing ---
+# Rows are independent, so large CSVs are split into chunks decided in separate processes.
+# Below this many rows, process start-up and pickling cost more than they save.
+PARALLEL_MIN_ROWS = 50_000
+
+def available_cpus():
+    """CPUs this process may run on (respects affinity/container limits where the OS exposes them)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+_worker_engine = None # Per-process WorkflowEngine, built once by _init_worker_engine
+
+def _init_worker_engine(workflow_data_dict: dict):
+    # Compiled rules hold closures and code objects that don't pickle, so each worker rebuilds the engine
+    global _worker_engine
+    logging.getLogger().setLevel(logging.WARNING) # Keep per-worker engine setup out of the INFO log
+    _worker_engine = WorkflowEngine(workflow_data_dict)
+
+def _process_chunk(columns: dict, first_row_num: int):
+    return _worker_engine.process_columns(columns, first_row_num)
+
+def open_worker_pool(workflow_data_dict: dict, max_workers: int):
+    """Process pool whose workers each hold a WorkflowEngine for workflow_data_dict; pass it to decide_rows."""
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker_engine, initargs=(workflow_data_dict,))
+
+def decide_rows(engine: WorkflowEngine, columns: dict, num_rows: int, first_row_num=2, executor=None, max_workers=1):
+    """
+    Returns the decision for every row of a columnar table. Large tables are split into one chunk per
+    worker of `executor` (see open_worker_pool), if given. Decisions come back in row order; row
+    numbers in log messages match the CSV (header is row 1).
+    """
+    if executor is None or max_workers < 2 or num_rows < PARALLEL_MIN_ROWS:
+        return engine.process_columns(columns, first_row_num)
+
+    chunk_size = -(-num_rows // max_workers) # Ceiling division: one chunk per worker
+    starts = range(0, num_rows, chunk_size)
+    chunks = [{name: values[start:start + chunk_size] for name, values in columns.items()} for start in starts]
+    chunk_decisions = executor.map(_process_chunk, chunks, [first_row_num + start for start in starts])
+    return list(chain.from_iterable(chunk_decisions))
+
 
 # --- Main processing function to be called by Flask ---
-def run_workflow_processing(workflow_data_dict: dict, base_data_dir: str, output_dir: str):
+def run_workflow_processing(workflow_data_dict: dict, base_data_dir: str, output_dir: str, max_workers=None):
+    """
+    Decides every row of the workflow's Source CSV and writes them with a workflow_decision column to output_dir.
+    Large inputs are split across a pool of max_workers processes (default: available_cpus()). Callers that
+    already run several jobs in parallel processes should pass their share of the CPUs instead.
+    """
     # 1. Identify the source CSV file(s) from the workflow
     source_nodes_data = [node for node in workflow_data_dict.get("nodes", []) if node.get("type") == "Source"]
 
@@ -227,61 +1117,64 @@ def run_workflow_processing(workflow_data_dict: dict, base_data_dir: str, output
     if not engine.nodes: # Should be caught by constructor but double check
         return {"error": "Workflow engine failed to load nodes from provided data.", "output_file": None, "stats": None}
 
-    # 3. Load the specified CSV data
-    all_input_data = load_csv_data_from_file(input_csv_filepath)
-    if all_input_data is None: # load_csv_data_from_file returns None on file not found or read error
+    # 3. Open the specified CSV data; it is streamed in batches from here on, never loaded whole
+    if not os.path.exists(input_csv_filepath):
+        logging.error("CSV data file '%s' not found.", input_csv_filepath)
         return {"error": f"Failed to load data from '{input_csv_filepath}'. Check logs.", "output_file": None, "stats": None}
-    if not all_input_data: # Empty list if CSV was empty but readable
+    batches = iter_csv_columnar(input_csv_filepath, STREAM_BATCH_ROWS)
+    try:
+        first_batch = next(batches, None) # Read before creating the output, so bad input leaves no file behind
+    except ValueError as e: # Read error, already logged
+        return {"error": str(e), "output_file": None, "stats": None}
+    if first_batch is None: # No header, or a header with no rows under it
         return {"error": f"No data rows found in '{input_csv_filepath}'.", "output_file": None, "stats": None}
 
-    # 4. Process data (rest of the function is similar to before)
-    processed_data = []
+    # 4. Process data batch by batch, writing each decided batch straight to the output
     logging.info(f"=== PROCESSING CSV: {input_csv_filepath} using workflow ===")
     start_time = time.time()
     decision_counts = {} # Using a dict for flexible decision categories
+    total_processed = 0
 
-    for i, data_row in enumerate(all_input_data):
-        decision = engine.process_event(data_row.copy(), row_num_for_log=i + 2)
-        decision_counts[decision] = decision_counts.get(decision, 0) + 1
-        
-        output_row = data_row.copy()
-        output_row['workflow_decision'] = decision
-        processed_data.append(output_row)
+    os.makedirs(output_dir, exist_ok=True)
+    timestamp = time.strftime("%Y%m%d-%H%M%S")
+    # The random part keeps concurrent runs on the same CSV within one second from sharing an output file
+    output_filename = f"processed_{timestamp}_{uuid4().hex[:8]}_{os.path.basename(csv_filename_from_node)}" # Use actual CSV name
+    output_filepath = os.path.join(output_dir, output_filename)
+    # Original headers (stripped) + workflow_decision, which replaces an input column of the same name in place
+    output_fieldnames = list(first_batch) + ([] if 'workflow_decision' in first_batch else ['workflow_decision'])
+
+    if max_workers is None: max_workers = available_cpus()
+    first_batch_rows = len(next(iter(first_batch.values())))
+    use_pool = max_workers > 1 and first_batch_rows >= PARALLEL_MIN_ROWS # Only worth starting for large inputs
+    try:
+        with open(output_filepath, mode='w', newline='', encoding='utf-8', buffering=OUTPUT_BUFFER_BYTES) as outfile, \
+                (open_worker_pool(workflow_data_dict, max_workers) if use_pool else nullcontext()) as executor:
+            writer = csv.writer(outfile)
+            writer.writerow(output_fieldnames)
+            for columns in chain([first_batch], batches):
+                num_rows = len(next(iter(columns.values())))
+                decisions = decide_rows(engine, columns, num_rows, 2 + total_processed, executor, max_workers)
+                for decision in decisions:
+                    decision_counts[decision] = decision_counts.get(decision, 0) + 1
+                total_processed += num_rows
+                columns['workflow_decision'] = decisions # Decisions become the last output column
+                writer.writerows(zip(*columns.values())) # Rows are zipped from the columns, never built as dicts
+    except ValueError as e: # Input read error partway through, already logged
+        os.remove(output_filepath)
+        return {"error": str(e), "output_file": None, "stats": None}
+    except Exception as e:
+        error_msg = f"Error writing output CSV: {e}"
+        logging.error(error_msg)
+        return {"error": error_msg, "output_file": None, "stats": None}
 
     stats = {
-        "total_processed": len(all_input_data),
-        "time_taken": f"{time.time() - start_time:.2f}s",
+        "total_processed": total_processed,
+        "time_taken": f"{time.time() - start_time:.2f}s", # Reading, deciding and writing are interleaved
         "decisions": decision_counts # This provides a breakdown
     }
     logging.info(f"=== PROCESSING COMPLETE: Stats: {stats} ===")
-
-    # 5. Save output
-    if processed_data:
-        os.makedirs(output_dir, exist_ok=True)
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        output_filename = f"processed_{timestamp}_{os.path.basename(csv_filename_from_node)}" # Use actual CSV name
-        output_filepath = os.path.join(output_dir, output_filename)
-        
-        # Determine fieldnames from the first row of processed_data (which includes original + decision)
-        if processed_data:
-            output_fieldnames = list(processed_data[0].keys())
-        else: # Should not happen if all_input_data had items
-            output_fieldnames = ['workflow_decision']
-
-
-        try:
-            with open(output_filepath, mode='w', newline='', encoding='utf-8') as outfile:
-                writer = csv.DictWriter(outfile, fieldnames=output_fieldnames, extrasaction='ignore')
-                writer.writeheader()
-                writer.writerows(processed_data)
-            logging.info(f"Processed data saved to: {output_filepath}")
-            return {"error": None, "output_file": output_filename, "stats": stats}
-        except Exception as e:
-            error_msg = f"Error writing output CSV: {e}"
-            logging.error(error_msg)
-            return {"error": error_msg, "output_file": None, "stats": stats}
-    else:
-        return {"error": "No data was processed to write to output.", "output_file": None, "stats": stats}
+    logging.info("Processed data saved to: %s", output_filepath)
+    return {"error": None, "output_file": output_filename, "stats": stats}
 
 
 # --- Main block for standalone testing ---
@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+import unittest
+import logging
+
+BUILD_DIR = tempfile.TemporaryDirectory()
+os.environ["REACT_BUILD_DIR"] = BUILD_DIR.name # Read when app is imported, so the real build/ is never touched
+for name, content in {"index.html": b"<html></html>", "main.1234abcd.js": b"console.log(1);",
+                      "main.1234abcd.js.gz": b"gzipped", "manifest.json": b"{}"}.items():
+    with open(os.path.join(BUILD_DIR.name, name), "wb") as f:
+        f.write(content)
+
+import app
+
+logging.disable(logging.CRITICAL)
+
+
+def tearDownModule():
+    app.WORKFLOW_EXECUTOR.shutdown()
+    BUILD_DIR.cleanup()
+
+
+class BuildServingTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def test_index_is_served_from_memory(self):
+        response = self.client.get("/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"<html></html>")
+        self.assertEqual(self.client.get("/", headers={"If-None-Match": response.headers["ETag"]}).status_code, 304)
+
+    def test_hashed_asset_is_immutable(self):
+        response = self.client.get("/main.1234abcd.js")
+        self.assertEqual(response.data, b"console.log(1);")
+        self.assertTrue(response.cache_control.immutable)
+        response.close()
+
+    def test_unhashed_file_is_revalidated(self):
+        response = self.client.get("/manifest.json")
+        self.assertEqual(response.cache_control.max_age, 0)
+        self.assertTrue(response.cache_control.must_revalidate)
+        response.close()
+
+    def test_matching_etag_returns_not_modified(self):
+        first = self.client.get("/main.1234abcd.js")
+        etag = first.headers["ETag"]
+        first.close()
+        response = self.client.get("/main.1234abcd.js", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_precompressed_variant_keeps_content_type(self):
+        response = self.client.get("/main.1234abcd.js", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.data, b"gzipped")
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("javascript", response.mimetype)
+        response.close()
+
+    def test_unknown_path_falls_back_to_index(self):
+        response = self.client.get("/workflows/some-client-route")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, b"<html></html>")
+
+
+class JobTests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.app.test_client()
+
+    def wait_for_job(self, job_id):
+        while True:
+            response = self.client.get(f"/jobs/{job_id}")
+            if response.status_code != 202:
+                return response
+            time.sleep(0.05)
+
+    def test_dead_worker_is_reported_and_pool_replaced(self):
+        response = self.wait_for_job(app.submit_job(os._exit, 1))
+        self.assertEqual(response.status_code, 500)
+        self.assertIn("stopped unexpectedly", response.get_json()["error"])
+        # The pool is broken now; the next job must get a fresh one instead of failing
+        response = self.wait_for_job(app.submit_job(dict, [("error", None), ("output_file", None)]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()["state"], "done")
+
+
+if __name__ == "__main__":
+    unittest.main()
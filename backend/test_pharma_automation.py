@@ -0,0 +1,217 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+import logging
+
+import pharma_automation
+from pharma_automation import WorkflowEngine, parse_csv_column, parse_csv_value, run_workflow_processing
+
+logging.disable(logging.CRITICAL)
+
+
+def discard_if(code_line, variable_type="float"):
+    """Workflow with a single Rule whose True output feeds a DISCARD Action."""
+    return {
+        "nodes": [
+            {"id": "source", "type": "Source"},
+            {"id": "rule", "type": "Rule", "variableType": variable_type, "codeLine": code_line},
+            {"id": "discard", "type": "Action", "label": "DISCARD"},
+        ],
+        "connections": [
+            {"sourceNodeId": "source", "sourceOutputKey": "output0", "targetNodeId": "rule", "targetInputKey": "input0"},
+            {"sourceNodeId": "rule", "sourceOutputKey": "outputTrue", "targetNodeId": "discard", "targetInputKey": "input0"},
+        ],
+    }
+
+
+@unittest.skipIf(pharma_automation.np is None, "NumPy is not installed")
+class VectorizedRuleTests(unittest.TestCase):
+    def assert_batch_matches_rows(self, code_line, rows, variable_type="float"):
+        engine = WorkflowEngine(discard_if(code_line, variable_type))
+        expected = [engine.process_event(row, i) for i, row in enumerate(rows)]
+        self.assertEqual(engine.process_batch(rows), expected)
+        return expected
+
+    def test_int_literal_beyond_float64_precision(self):
+        # 2**53 + 1 rounds to 2**53 as float64; eval() compares it exactly against the float column
+        decisions = self.assert_batch_matches_rows("c < 9007199254740993", [{"c": 9007199254740992.0}])
+        self.assertEqual(decisions, ["DISCARD"])
+
+    def test_int_literal_at_float64_precision_limit_stays_vectorized(self):
+        rule = WorkflowEngine(discard_if("c < 9007199254740992")).compiled_rules["rule"]
+        self.assertIsNotNone(rule.vectorized)
+        self.assert_batch_matches_rows("c < 9007199254740992", [{"c": 9007199254740991.0}, {"c": 9007199254740992.0}])
+
+
+def gate_lattice(levels):
+    """Workflow where each level has an AND and an OR, both reading the two nodes of the level before."""
+    nodes = [{"id": "source", "type": "Source"},
+             {"id": "a", "type": "Rule", "variableType": "float", "codeLine": "a > 1"},
+             {"id": "b", "type": "Rule", "variableType": "float", "codeLine": "b > 1"}]
+    connections = [{"sourceNodeId": "source", "sourceOutputKey": "output0", "targetNodeId": rule_id, "targetInputKey": "input0"}
+                   for rule_id in ("a", "b")]
+    previous = [("a", "outputTrue"), ("b", "outputTrue")]
+    for level in range(levels):
+        for gate_type in ("AND", "OR"):
+            nodes.append({"id": f"{gate_type}{level}", "type": gate_type})
+            connections += [{"sourceNodeId": source_id, "sourceOutputKey": output_key, "targetNodeId": f"{gate_type}{level}",
+                             "targetInputKey": f"input{i}"} for i, (source_id, output_key) in enumerate(previous)]
+        previous = [(f"AND{level}", "output"), (f"OR{level}", "output")]
+    nodes.append({"id": "discard", "type": "Action", "label": "DISCARD"})
+    connections += [{"sourceNodeId": source_id, "sourceOutputKey": output_key, "targetNodeId": "discard", "targetInputKey": f"input{i}"}
+                    for i, (source_id, output_key) in enumerate(previous)]
+    return {"nodes": nodes, "connections": connections}
+
+
+def code_size(code):
+    """Bytecode size of a code object and the functions nested in it."""
+    return len(code.co_code) + sum(code_size(const) for const in code.co_consts if hasattr(const, "co_code"))
+
+
+class RowFunctionTests(unittest.TestCase):
+    def test_shared_nodes_keep_row_function_linear(self):
+        small, large = WorkflowEngine(gate_lattice(20)), WorkflowEngine(gate_lattice(40))
+        # Inlining each shared node at every use would double the code per level
+        self.assertLess(code_size(large.decide_row.__code__), 3 * code_size(small.decide_row.__code__))
+        rows = [{"a": "2", "b": "0"}, {"a": "0", "b": "0"}, {"a": "2", "b": "2"}]
+        self.assertEqual([large.process_event(row, i) for i, row in enumerate(rows)], ["DISCARD", "ACCEPT", "DISCARD"])
+
+
+class NumbaKernelDirTests(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.kernel_dir = os.path.join(temp_dir.name, "kernels")
+        patcher = mock.patch.object(pharma_automation, "NUMBA_KERNEL_DIR", self.kernel_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_kernel_dir_is_created_private(self):
+        pharma_automation._ensure_private_kernel_dir()
+        self.assertEqual(os.stat(self.kernel_dir).st_mode & 0o777, 0o700)
+
+    def test_kernel_dir_writable_by_others_is_refused(self):
+        os.makedirs(self.kernel_dir)
+        os.chmod(self.kernel_dir, 0o777)
+        with self.assertRaises(PermissionError):
+            pharma_automation._ensure_private_kernel_dir()
+
+    def test_oldest_kernels_are_pruned_with_their_cache_files(self):
+        pharma_automation._ensure_private_kernel_dir()
+        os.makedirs(os.path.join(self.kernel_dir, "__pycache__"))
+        for age, name in enumerate(["kernel_c", "kernel_b", "kernel_a"]): # kernel_a is the oldest
+            module_path = os.path.join(self.kernel_dir, name + ".py")
+            open(module_path, "w").close()
+            open(os.path.join(self.kernel_dir, "__pycache__", name + ".decide-3.py311.nbi"), "w").close()
+            os.utime(module_path, (1000 - age, 1000 - age))
+        with mock.patch.object(pharma_automation, "NUMBA_KERNEL_CACHE_LIMIT", 1):
+            pharma_automation._prune_numba_kernels(keep="kernel_a")
+        self.assertEqual(sorted(os.listdir(self.kernel_dir)), ["__pycache__", "kernel_a.py", "kernel_c.py"])
+        self.assertEqual(sorted(os.listdir(os.path.join(self.kernel_dir, "__pycache__"))),
+                         ["kernel_a.decide-3.py311.nbi", "kernel_c.decide-3.py311.nbi"])
+
+
+# Building blocks for the randomized workflows below: parsed CSV values, Rule expressions and variable types,
+# including ones that fail to compile, raise per row, or fall outside the vectorized and numba subsets
+RANDOM_VALUES = [None, True, False, 0.0, 1.0, -2.5, 0.8, 3.0, 1e20, float("nan"), float("inf"), "blue", "red", "x y", "", "abc"]
+RANDOM_FLOAT_VALUES = [True, False, 0.0, 1.0, -2.5, 0.8, 3.0, 5.0, 1e20, float("nan"), float("inf"), "x"]
+RANDOM_CODE_LINES = ["a > 0.8", "a + b > 1", "a * b < c", "-a < b", "not a", "a", "s == 'blue'", "s < 'm'", "a == 1",
+                     "1 < a <= 3", "a and b or c", "not (a > 1 and b < 2)", "a / b > 1", "len(s) > 2", "zz > 1", "",
+                     "a >", "a is None", "a in (1, 2)", "a - 2 * b >= -1", "(a > 1) == (b > 1)", "True", "a != a"]
+RANDOM_FLOAT_CODE_LINES = ["a > 0.8", "a + b > 1", "a * b < c", "-a < b", "not a", "a", "a == 1", "1 < a <= 3",
+                           "a and b or c", "not (a > 1 and b < 2)", "a - 2 * b >= -1", "(a > 1) == (b > 1)", "a != a"]
+RANDOM_VARIABLE_TYPES = ["float", "int", "string", "bool", "Float", "date"]
+
+
+def random_workflow(rng, code_lines, variable_types, action_labels):
+    """Source, a few Rules, AND/OR gates wired to random earlier outputs, and Actions fed from any of them."""
+    nodes = [{"id": "source", "type": "Source"}]
+    connections = []
+    outputs = [("source", "output0")]
+    for i in range(rng.randint(1, 6)):
+        nodes.append({"id": f"rule{i}", "type": "Rule", "variableType": rng.choice(variable_types), "codeLine": rng.choice(code_lines)})
+        outputs += [(f"rule{i}", "outputTrue"), (f"rule{i}", "outputFalse")]
+    for i in range(rng.randint(0, 4)):
+        nodes.append({"id": f"gate{i}", "type": rng.choice(["AND", "OR"])})
+        for j in range(rng.randint(0, 3)):
+            source_id, output_key = rng.choice(outputs)
+            connections.append({"sourceNodeId": source_id, "sourceOutputKey": output_key, "targetNodeId": f"gate{i}", "targetInputKey": f"input{j}"})
+        outputs.append((f"gate{i}", "output"))
+    for i in range(rng.randint(1, 3)):
+        nodes.append({"id": f"action{i}", "type": "Action", "label": rng.choice(action_labels)})
+        for j in range(rng.randint(1, 2)):
+            source_id, output_key = rng.choice(outputs)
+            connections.append({"sourceNodeId": source_id, "sourceOutputKey": output_key, "targetNodeId": f"action{i}", "targetInputKey": f"input{j}"})
+    rng.shuffle(nodes)
+    return {"nodes": nodes, "connections": connections, "defaultAction": rng.choice(["ACCEPT", "KEEP"])}
+
+
+def outcome(fn, *args):
+    """fn(*args), or the type of the exception it raised."""
+    try:
+        return fn(*args)
+    except Exception as e:
+        return type(e)
+
+
+class DifferentialTests(unittest.TestCase):
+    """The row function, the array path and the numba kernel must decide every row identically."""
+    def assert_paths_agree(self, workflow, rows):
+        engine = WorkflowEngine(workflow)
+        columns = {name: [row[name] for row in rows] for name in rows[0]}
+        per_row = outcome(lambda: [engine.process_event(dict(row), 2 + i) for i, row in enumerate(rows)])
+        self.assertEqual(outcome(engine.process_batch, [dict(row) for row in rows]), per_row, workflow)
+        self.assertEqual(outcome(engine.process_columns, columns), per_row, workflow)
+        return engine
+
+    def test_random_workflows(self):
+        rng = random.Random(1234)
+        for _ in range(300):
+            workflow = random_workflow(rng, RANDOM_CODE_LINES, RANDOM_VARIABLE_TYPES, ["DISCARD", "DISCARD", "FLAG"])
+            rows = [{name: rng.choice(RANDOM_VALUES) for name in ("a", "b", "c", "s")} for _ in range(rng.randint(1, 40))]
+            self.assert_paths_agree(workflow, rows)
+
+    @unittest.skipIf(pharma_automation.numba is None or pharma_automation.np is None, "Numba is not installed")
+    def test_random_workflows_on_numba_kernel(self):
+        rng = random.Random(5678)
+        with tempfile.TemporaryDirectory() as kernel_dir, \
+                mock.patch.object(pharma_automation, "NUMBA_KERNEL_DIR", kernel_dir), \
+                mock.patch.object(pharma_automation, "NUMBA_MIN_ROWS", 1):
+            kernel_workflows = 0
+            while kernel_workflows < 6: # Each distinct kernel takes a moment to compile
+                workflow = random_workflow(rng, RANDOM_FLOAT_CODE_LINES, ["float"], ["DISCARD"])
+                rows = [{name: rng.choice(RANDOM_FLOAT_VALUES) for name in ("a", "b", "c")} for _ in range(rng.randint(1, 40))]
+                engine = self.assert_paths_agree(workflow, rows)
+                kernel_workflows += engine.numba_plan is not None
+
+    def test_parse_csv_column_matches_parse_csv_value(self):
+        rng = random.Random(91011)
+        cells = ["1", " 2.5 ", "-3", "1e3", "+5", "1_000", "nan", "inf", "-Infinity", "", "  ", None, "true", "TRUE",
+                 "tRuE", "False ", "fAlse", "abc", "-", "0x10", "e5", "N/A", "i", "yes"]
+        numeric, boolean = cells[:8], ["true", "True", "TRUE", "false", "False", "FALSE"]
+        for _ in range(500):
+            pool = rng.choice([cells, numeric, boolean, numeric + [rng.choice(cells)]])
+            raw_values = [rng.choice(pool) for _ in range(rng.randint(1, 30))]
+            # repr() tells True from 1.0 and compares NaN
+            self.assertEqual(list(map(repr, parse_csv_column(raw_values))), [repr(parse_csv_value(cell)) for cell in raw_values], raw_values)
+
+
+class RunWorkflowProcessingTests(unittest.TestCase):
+    def test_same_second_runs_write_separate_outputs(self):
+        workflow = discard_if("c > 1")
+        workflow["nodes"][0]["source"] = "data.csv"
+        with tempfile.TemporaryDirectory() as data_dir:
+            with open(os.path.join(data_dir, "data.csv"), "w") as f:
+                f.write("c\n1\n2\n")
+            output_dir = os.path.join(data_dir, "out")
+            first = run_workflow_processing(workflow, data_dir, output_dir, max_workers=1)
+            second = run_workflow_processing(workflow, data_dir, output_dir, max_workers=1)
+            self.assertIsNone(first["error"])
+            self.assertNotEqual(first["output_file"], second["output_file"])
+            self.assertEqual(sorted(os.listdir(output_dir)), sorted([first["output_file"], second["output_file"]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
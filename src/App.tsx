@@ -5,6 +5,10 @@ import { useRete } from "rete-react-plugin";
 import { createEditor } from "./editor";
 import './styles.css'; // Import the unified stylesheet
 
+// How often to poll a workflow job's status, and how long to wait before giving up on it
+const JOB_POLL_INTERVAL_MS = 500;
+const JOB_POLL_TIMEOUT_MS = 10 * 60 * 1000;
+
 export default function App() {
   const [ref] = useRete(createEditor);
   const [isLoading, setIsLoading] = useState(false);
@@ -33,14 +37,31 @@ export default function App() {
         body: JSON.stringify(payload),
       });
 
-      const result = await response.json();
+      let result = await response.json();
 
       // 4. Handle errors returned from the backend (e.g., bad workflow, file not found)
       if (!response.ok) {
         throw new Error(result.error || `HTTP error! Status: ${response.status}`);
       }
 
-      // 5. On success, redirect the browser to the results page URL provided by Flask
+      // 5. The workflow runs as a background job; poll its status URL until it finishes
+      const statusUrl = result.status_url;
+      const pollDeadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+      let status = response.status;
+      while (status === 202 && statusUrl) {
+        if (Date.now() >= pollDeadline) {
+          throw new Error(`Processing did not finish within ${JOB_POLL_TIMEOUT_MS / 60000} minutes. Please try again later.`);
+        }
+        await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+        const statusResponse = await fetch(statusUrl);
+        result = await statusResponse.json();
+        if (!statusResponse.ok) {
+          throw new Error(result.error || `HTTP error! Status: ${statusResponse.status}`);
+        }
+        status = statusResponse.status;
+      }
+
+      // 6. On success, redirect the browser to the results page URL provided by Flask
       if (result.results_page_url) {
         window.location.href = result.results_page_url;
       } else {
@@ -48,7 +69,7 @@ export default function App() {
       }
 
     } catch (error) {
-      // 6. Handle network errors or other exceptions
+      // 7. Handle network errors or other exceptions
       console.error("Failed to process workflow:", error);
       alert(`An error occurred: ${error instanceof Error ? error.message : String(error)}`);
       setIsLoading(false); // Reset loading state on error